@@ -79,6 +79,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Los hilos de 'procesar_tareas' escriben a la vez: cada transacción toma
+            # el candado de escritura desde el inicio (si una lee y luego quiere
+            # escribir, SQLite no la deja y falla con "database is locked"),
+            # y si está ocupado espera hasta 'timeout' segundos en vez de fallar.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -137,6 +145,55 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # Email que aparecerá como "De:"
 DEFAULT_FROM_EMAIL = 'tu-inmobiliaria@ejemplo.com'
 
+# Días antes del vencimiento en que 'revisar_pagos' manda recordatorio.
+# Un valor negativo es un aviso de atraso (ej. -1 = un día después de vencer).
+RECORDATORIOS_PAGO_DIAS = [7, 3, 0, -1]
+
+# Hasta cuántos días hacia atrás se buscan pagos atrasados sin aviso
+RECORDATORIOS_VENTANA_DIAS = 30
+
+# Cola de tareas en segundo plano (comando 'procesar_tareas')
+TAREAS_TRABAJADORES = 4           # Hilos (o procesos) que ejecutan tareas a la vez
+TAREAS_REINTENTO_SEGUNDOS = 30    # Espera del primer reintento; se duplica en cada fallo
+TAREAS_TIEMPO_LIMITE_MINUTOS = 30 # Si una tarea lleva más que esto 'En proceso', se vuelve a tomar
+
+# 'archivar_pagos' mueve los pagos de contratos que terminaron hace más de estos meses
+ARCHIVO_PAGOS_MESES = 12
+
+# Cuántas "propiedades similares" se muestran en el detalle de una propiedad.
+# Al guardar una propiedad se actualizan de forma incremental; 'calcular_similares'
+# debe correr periódicamente (ej. cada noche) para corregir la desviación acumulada.
+SIMILARES_POR_PROPIEDAD = 4
+
+# Carpeta donde 'generar_paginas_estaticas' deja las páginas públicas en HTML
+# para que el servidor web las sirva directo (None = desactivado)
+PAGINAS_ESTATICAS_ROOT = os.path.join(BASE_DIR, 'publicado')
+
+# Una foto que una subida acaba de reutilizar no se borra durante este tiempo
+# (su registro puede no estar confirmado todavía; ver storage.py)
+FOTOS_GRACIA_SEGUNDOS = 600
+
+# Caché en archivos: lo comparten el sitio y el worker ('procesar_tareas'),
+# así las señales del worker también invalidan el portal.
+# Al pasar MAX_ENTRIES se borra un tercio al azar (solo cuesta volver a calcular un portal)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Cuánto dura en caché el portal de un inquilino (las señales lo borran antes si algo cambia)
+PORTAL_CACHE_SEGUNDOS = 60 * 60
+
+# Sesiones en la base con copia en el caché: las lecturas salen del caché y,
+# si el caché las borra al llenarse, siguen en la base (nadie pierde su sesión).
+# (No en cookies firmadas: con la SECRET_KEY en el repositorio cualquiera podría falsificarlas)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 UNFOLD = {
     "SITE_TITLE": "Inmobiliaria Admin", # Título en la pestaña del navegador
     "SITE_HEADER": "Inmobiliaria XYZ",  # Título en la barra lateral
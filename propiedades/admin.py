@@ -1,7 +1,11 @@
 # propiedades/admin.py
 
 from django.contrib import admin
-from .models import Propiedad, Cliente, Contrato, FotoPropiedad, Pago
+from .models import Propiedad, Cliente, Contrato, EstadisticaPrecio, FotoPropiedad, Pago, PagoArchivado, RecordatorioEnviado, Tarea
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
 # --- Personalización para el modelo Propiedad ---
 class FotoPropiedadInline(admin.TabularInline):
@@ -12,7 +16,7 @@ class FotoPropiedadInline(admin.TabularInline):
 @admin.register(Propiedad)
 class PropiedadAdmin(admin.ModelAdmin):
     # Columnas que se mostrarán en la lista
-    list_display = ('titulo', 'tipo_operacion', 'estado', 'precio', 'ciudad')
+    list_display = ('titulo', 'tipo_operacion', 'estado', 'precio', 'ciudad', 'get_precio_m2', 'get_vs_mediana')
     
     # Filtros que aparecerán a la derecha
     list_filter = ('tipo_operacion', 'estado', 'ciudad')
@@ -22,6 +26,39 @@ class PropiedadAdmin(admin.ModelAdmin):
 
     inlines = [FotoPropiedadInline]
 
+    def get_queryset(self, request):
+        # La mediana de su ciudad viene en la misma consulta (subconsulta a EstadisticaPrecio,
+        # que guarda la ciudad normalizada: lo mismo que 'normalizar_ciudad', pero en SQL)
+        mediana = EstadisticaPrecio.objects.filter(
+            ciudad=Lower(Trim(OuterRef('ciudad'))),
+            tipo_operacion=OuterRef('tipo_operacion')
+        ).values('mediana_m2')[:1]
+        return super().get_queryset(request).annotate(mediana_ciudad_m2=Subquery(mediana))
+
+    def get_precio_m2(self, obj):
+        return round(obj.precio_por_m2, 2) if obj.precio_por_m2 is not None else None
+    get_precio_m2.short_description = 'Precio / m²'
+
+    def get_vs_mediana(self, obj):
+        if obj.precio_por_m2 is None or not obj.mediana_ciudad_m2:
+            return None
+        diferencia = (obj.precio_por_m2 - obj.mediana_ciudad_m2) / obj.mediana_ciudad_m2 * 100
+        return f"{diferencia:+.0f}%"
+    get_vs_mediana.short_description = 'vs. mediana ciudad'
+
+@admin.register(EstadisticaPrecio)
+class EstadisticaPrecioAdmin(admin.ModelAdmin):
+    # Solo lectura: la tabla la llena 'calcular_estadisticas_precio'
+    list_display = ('ciudad', 'tipo_operacion', 'conteo', 'cuartil_inferior_m2', 'mediana_m2', 'cuartil_superior_m2', 'actualizado')
+    list_filter = ('tipo_operacion',)
+    search_fields = ('ciudad',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # --- Personalización para el modelo Cliente ---
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
@@ -30,11 +67,34 @@ class ClienteAdmin(admin.ModelAdmin):
     raw_id_fields = ('user',)
 
 # --- Personalización para el modelo Contrato ---
+class AdeudoFilter(admin.SimpleListFilter):
+    # Filtro por atraso, leído del ResumenContrato (no recorre los Pagos)
+    title = 'Situación de pago'
+    parameter_name = 'adeudo'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('con_adeudo', 'Con pagos vencidos'),
+            ('al_corriente', 'Al corriente'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'con_adeudo':
+            return queryset.filter(resumen__pagos_vencidos__gt=0)
+        if self.value() == 'al_corriente':
+            return queryset.filter(resumen__pagos_vencidos=0)
+        return queryset
+
 @admin.register(Contrato)
 class ContratoAdmin(admin.ModelAdmin):
-    list_display = ('get_propiedad_titulo', 'get_inquilino_nombre', 'fecha_inicio', 'fecha_fin', 'monto_renta_actual')
-    list_filter = ('fecha_inicio', 'fecha_fin')
+    list_display = (
+        'get_propiedad_titulo', 'get_inquilino_nombre', 'fecha_inicio', 'fecha_fin', 'monto_renta_actual', 'fecha_proximo_aumento',
+        'get_pagos_vencidos', 'get_monto_adeudado', 'get_proximo_vencimiento'
+    )
+    list_filter = (AdeudoFilter, 'fecha_inicio', 'fecha_fin')
     search_fields = ('propiedad__titulo', 'inquilino__nombre_completo') # Buscar dentro de los modelos relacionados
+    list_select_related = ('propiedad', 'inquilino', 'resumen') # Todo en una sola consulta
+    readonly_fields = ('get_historial_pagos',) # Historial de solo lectura en la ficha del contrato
 
     # Funciones para mostrar nombres legibles en la lista
     def get_propiedad_titulo(self, obj):
@@ -45,6 +105,39 @@ class ContratoAdmin(admin.ModelAdmin):
         return obj.inquilino.nombre_completo
     get_inquilino_nombre.short_description = 'Inquilino' # Nombre de la columna
 
+    # Columnas del ResumenContrato (pueden faltar si aún no se ha calculado)
+    def get_pagos_vencidos(self, obj):
+        return obj.resumen.pagos_vencidos if hasattr(obj, 'resumen') else None
+    get_pagos_vencidos.short_description = 'Vencidos'
+    get_pagos_vencidos.admin_order_field = 'resumen__pagos_vencidos'
+
+    def get_monto_adeudado(self, obj):
+        return obj.resumen.monto_adeudado if hasattr(obj, 'resumen') else None
+    get_monto_adeudado.short_description = 'Adeudo'
+    get_monto_adeudado.admin_order_field = 'resumen__monto_adeudado'
+
+    def get_proximo_vencimiento(self, obj):
+        return obj.resumen.proximo_vencimiento if hasattr(obj, 'resumen') else None
+    get_proximo_vencimiento.short_description = 'Próximo vencimiento'
+    get_proximo_vencimiento.admin_order_field = 'resumen__proximo_vencimiento'
+
+    # Pagos y PagosArchivados juntos (ver Contrato.historial_pagos)
+    def get_historial_pagos(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
+        filas = format_html_join('', '<tr><td>{}</td><td>${}</td><td>{}</td><td>{}</td></tr>', (
+            (pago['fecha_vencimiento'], pago['monto'], pago['estado'], pago['fecha_pago'] or '-')
+            for pago in obj.historial_pagos()
+        ))
+        if not filas:
+            return 'Sin pagos'
+        return format_html(
+            '<table><thead><tr><th>Vencimiento</th><th>Monto</th><th>Estado</th><th>Fecha de pago</th></tr></thead>'
+            '<tbody>{}</tbody></table>',
+            filas
+        )
+    get_historial_pagos.short_description = 'Historial de pagos'
+
 @admin.register(Pago)
 class PagoAdmin(admin.ModelAdmin):
     list_display = (
@@ -63,3 +156,41 @@ class PagoAdmin(admin.ModelAdmin):
 
     # Optimización para el campo de contrato
     raw_id_fields = ('contrato',)
+
+# Los pagos archivados se consultan igual que los Pagos, pero son de solo lectura
+@admin.register(PagoArchivado)
+class PagoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'contrato', 'monto', 'fecha_vencimiento', 'estado', 'fecha_pago', 'archivado_en')
+    list_filter = ('estado', 'fecha_vencimiento')
+    search_fields = PagoAdmin.search_fields
+    list_select_related = ('contrato__propiedad', 'contrato__inquilino')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False # Es el historial del inquilino (y su portal en caché no se enteraría)
+
+@admin.register(RecordatorioEnviado)
+class RecordatorioEnviadoAdmin(admin.ModelAdmin):
+    list_display = ('pago', 'dias_aviso', 'fecha_envio')
+    list_filter = ('dias_aviso', 'fecha_envio')
+    search_fields = ('pago__contrato__inquilino__nombre_completo', 'pago__contrato__inquilino__email')
+    raw_id_fields = ('pago',)
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('funcion', 'estado', 'intentos', 'ejecutar_despues', 'creada_en', 'terminada_en')
+    list_filter = ('estado', 'funcion')
+    readonly_fields = ('creada_en', 'iniciada_en', 'terminada_en', 'ultimo_error')
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar las tareas seleccionadas')
+    def reintentar(self, request, queryset):
+        actualizadas = queryset.exclude(estado='En proceso').update(
+            estado='Pendiente', intentos=0, ejecutar_despues=timezone.now()
+        )
+        self.message_user(request, f"{actualizadas} tareas se volvieron a encolar.")
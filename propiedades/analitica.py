@@ -0,0 +1,80 @@
+# propiedades/analitica.py
+
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EstadisticaPrecio, Propiedad, normalizar_ciudad
+
+
+def cuantiles_por_grupo(valores_ordenados, inicios, conteos, q):
+    """
+    Cuantil 'q' (0 a 1) de cada grupo, con interpolación lineal
+    (lo mismo que np.percentile), para todos los grupos a la vez.
+    'valores_ordenados' debe venir ordenado por grupo y luego por valor.
+    """
+    posicion = inicios + q * (conteos - 1)
+    abajo = np.floor(posicion).astype(np.int64)
+    arriba = np.ceil(posicion).astype(np.int64)
+    return valores_ordenados[abajo] + (valores_ordenados[arriba] - valores_ordenados[abajo]) * (posicion - abajo)
+
+
+def calcular_estadisticas_precio():
+    """
+    Recalcula la tabla EstadisticaPrecio con el precio por m² de todas las
+    propiedades (disponibles, rentadas y vendidas), por ciudad y operación.
+
+    Se leen solo 4 columnas con values_list y todo el cálculo es con NumPy
+    sobre arreglos (sin ciclos por propiedad ni por grupo).
+    """
+    filas = Propiedad.objects.filter(metros_cuadrados__gt=0).values_list(
+        'ciudad', 'tipo_operacion', 'precio', 'metros_cuadrados'
+    ).order_by().iterator(chunk_size=5000)
+    columnas = list(zip(*filas))
+
+    if not columnas:
+        EstadisticaPrecio.objects.all().delete()
+        return 0
+
+    ciudades, tipos, precios, metros = columnas
+    precio_m2 = np.array(precios, dtype=np.float64) / np.array(metros, dtype=np.float64)
+
+    # 1. Un número de grupo por cada combinación ciudad + operación
+    nombres_ciudad, ciudad_idx = np.unique(np.array([normalizar_ciudad(ciudad) for ciudad in ciudades]), return_inverse=True)
+    nombres_tipo, tipo_idx = np.unique(np.array(tipos), return_inverse=True)
+    grupos, grupo_idx, conteos = np.unique(
+        ciudad_idx * len(nombres_tipo) + tipo_idx, return_inverse=True, return_counts=True
+    )
+
+    # 2. Ordenamos por grupo y, dentro del grupo, por precio por m²
+    orden = np.lexsort((precio_m2, grupo_idx))
+    valores = precio_m2[orden]
+    inicios = np.concatenate(([0], np.cumsum(conteos)[:-1]))
+
+    q1 = cuantiles_por_grupo(valores, inicios, conteos, 0.25)
+    mediana = cuantiles_por_grupo(valores, inicios, conteos, 0.50)
+    q3 = cuantiles_por_grupo(valores, inicios, conteos, 0.75)
+
+    # 3. Reemplazamos la tabla completa
+    ahora = timezone.now()
+    centavos = Decimal('0.01')
+    estadisticas = [
+        EstadisticaPrecio(
+            ciudad=nombres_ciudad[grupo // len(nombres_tipo)],
+            tipo_operacion=nombres_tipo[grupo % len(nombres_tipo)],
+            conteo=int(conteos[i]),
+            mediana_m2=Decimal(str(mediana[i])).quantize(centavos),
+            cuartil_inferior_m2=Decimal(str(q1[i])).quantize(centavos),
+            cuartil_superior_m2=Decimal(str(q3[i])).quantize(centavos),
+            actualizado=ahora,
+        )
+        for i, grupo in enumerate(grupos)
+    ]
+
+    with transaction.atomic():
+        EstadisticaPrecio.objects.all().delete()
+        EstadisticaPrecio.objects.bulk_create(estadisticas, batch_size=1000)
+
+    return len(estadisticas)
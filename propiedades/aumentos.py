@@ -0,0 +1,118 @@
+# propiedades/aumentos.py
+
+from decimal import Decimal
+
+from django.db import NotSupportedError
+from django.db.models import DateField, DecimalField, ExpressionWrapper, F, Func, Value
+from django.db.models.functions import ExtractMonth, ExtractYear, Round
+
+from .cache_portal import invalidar_portal_por_contratos
+from .models import Contrato
+
+
+class SumarMeses(Func):
+    """
+    fecha + N meses dentro de la base de datos (N puede ser otra columna).
+    Si el día no existe en el mes destino se usa el último día del mes,
+    igual que relativedelta (31 de enero + 1 mes = 28/29 de febrero).
+    """
+    arity = 2
+    output_field = DateField()
+
+    def compilar(self, compiler):
+        fecha, meses = self.get_source_expressions()
+        fecha_sql, fecha_params = compiler.compile(fecha)
+        meses_sql, meses_params = compiler.compile(meses)
+        return fecha_sql, tuple(fecha_params), meses_sql, tuple(meses_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"SumarMeses no está implementada para {connection.vendor}.")
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        fecha, fp, meses, mp = self.compilar(compiler)
+        # El menor entre "mismo día, N meses después" y "último día del mes destino"
+        sql = (
+            f"MIN("
+            f"DATE({fecha}, 'start of month', '+' || ({meses}) || ' months', "
+            f"'+' || (CAST(STRFTIME('%%d', {fecha}) AS INTEGER) - 1) || ' days'), "
+            f"DATE({fecha}, 'start of month', '+' || ({meses} + 1) || ' months', '-1 day'))"
+        )
+        return sql, fp + mp + fp + fp + mp
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        fecha, fp, meses, mp = self.compilar(compiler)
+        return f"({fecha} + make_interval(months => {meses}))::date", fp + mp
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        fecha, fp, meses, mp = self.compilar(compiler)
+        return f"DATE_ADD({fecha}, INTERVAL {meses} MONTH)", fp + mp
+
+
+def renta_con_aumento():
+    """
+    monto_renta_actual * (1 + porcentaje_aumento / 100), redondeado a centavos
+    con medio centavo hacia arriba (igual que generar_pagos_contrato).
+
+    Se calcula en centavos y centésimas de porcentaje (números enteros) para
+    que el redondeo sea exacto aunque la base guarde los decimales como flotantes.
+    """
+    centavos = Round(F('monto_renta_actual') * Value(Decimal('100')))
+    factor = Value(Decimal('10000')) + Round(F('porcentaje_aumento') * Value(Decimal('100')))
+    nuevos_centavos = Round(centavos * factor / Value(Decimal('10000')))
+    return ExpressionWrapper(
+        nuevos_centavos / Value(Decimal('100')),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def siguiente_fecha_de_aumento():
+    """
+    fecha_inicio + (meses ya transcurridos hasta el aumento actual + frecuencia).
+    Se cuenta siempre desde el inicio para que el día no se "recorra":
+    un contrato del 31 de enero vuelve al 31 después de pasar por febrero.
+    """
+    meses_transcurridos = (
+        (ExtractYear('fecha_proximo_aumento') - ExtractYear('fecha_inicio')) * 12
+        + ExtractMonth('fecha_proximo_aumento') - ExtractMonth('fecha_inicio')
+    )
+    return SumarMeses(F('fecha_inicio'), meses_transcurridos + F('frecuencia_aumento_meses'))
+
+
+def contratos_con_aumento_pendiente(hoy):
+    # Aumentos que ya tocan y que caen dentro de la vigencia del contrato
+    return Contrato.objects.filter(
+        fecha_proximo_aumento__lte=hoy,
+        frecuencia_aumento_meses__gt=0,
+    ).filter(
+        fecha_proximo_aumento__lte=F('fecha_fin'),
+    )
+
+
+def aplicar_aumentos(hoy):
+    """
+    Aplica el aumento a todos los contratos que ya lo deben, con un solo
+    UPDATE por vuelta, y mueve su 'fecha_proximo_aumento' un periodo.
+    Si un contrato debe varios periodos (ej. el comando no corrió en un
+    año), la siguiente vuelta lo vuelve a tomar.
+
+    Regresa {contrato_id: (renta_anterior, aumentos_aplicados)}.
+    Debe llamarse dentro de una transacción.
+    """
+    cambiados = {}
+
+    while True:
+        pendientes = contratos_con_aumento_pendiente(hoy)
+        # Bloqueamos las filas (en bases que lo soportan) para reportar exactamente lo que cambió
+        filas = list(pendientes.select_for_update().values_list('pk', 'monto_renta_actual'))
+        if not filas:
+            invalidar_portal_por_contratos(list(cambiados)) # El portal muestra la renta actual
+            return cambiados
+
+        pendientes.update(
+            monto_renta_actual=renta_con_aumento(),
+            fecha_proximo_aumento=siguiente_fecha_de_aumento(),
+        )
+
+        for pk, renta_anterior in filas:
+            anterior, aumentos = cambiados.get(pk, (renta_anterior, 0))
+            cambiados[pk] = (anterior, aumentos + 1)
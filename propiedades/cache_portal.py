@@ -0,0 +1,37 @@
+# propiedades/cache_portal.py
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Contrato
+
+
+def clave_portal(user_id, fecha=None):
+    # La fecha va en la clave: al cambiar el día el portal se vuelve a calcular
+    # (un pago 'Pendiente' de ayer ya se muestra como vencido)
+    fecha = fecha or timezone.now().date()
+    return f"portal:{user_id}:{fecha.isoformat()}"
+
+
+def invalidar_portal(user_ids):
+    """
+    Borra del caché el portal de estos usuarios. Se hace al confirmar la
+    transacción, para que nadie vuelva a guardar en caché los datos viejos.
+    """
+    user_ids = [user_id for user_id in set(user_ids) if user_id]
+    if user_ids:
+        # La clave se arma al confirmar, con la fecha de ese momento
+        transaction.on_commit(lambda: cache.delete_many([clave_portal(user_id) for user_id in user_ids]))
+
+
+def invalidar_portal_por_contratos(contrato_ids=None):
+    # Los inquilinos de esos contratos (o de todos si es None)
+    contratos = Contrato.objects.all()
+    if contrato_ids is not None:
+        contratos = contratos.filter(pk__in=contrato_ids)
+    invalidar_portal(contratos.values_list('inquilino__user_id', flat=True))
+
+
+def invalidar_portal_por_propiedad(propiedad_id):
+    invalidar_portal(Contrato.objects.filter(propiedad_id=propiedad_id).values_list('inquilino__user_id', flat=True))
@@ -0,0 +1,41 @@
+# propiedades/management/commands/aplicar_aumentos.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from propiedades.aumentos import aplicar_aumentos
+from propiedades.models import Contrato
+
+class Command(BaseCommand):
+    help = 'Aplica el aumento anual de renta a todos los contratos que ya lo deben (un UPDATE por periodo).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Muestra qué contratos cambiarían, sin guardar nada.'
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.now().date()
+        self.stdout.write(f"--- [APLICAR AUMENTOS] Iniciando (Fecha de hoy: {hoy}) ---")
+
+        with transaction.atomic():
+            cambiados = aplicar_aumentos(hoy)
+
+            contratos = Contrato.objects.filter(pk__in=cambiados).select_related('propiedad', 'inquilino')
+            for contrato in contratos:
+                renta_anterior, aumentos = cambiados[contrato.pk]
+                self.stdout.write(
+                    f" -> {contrato}: ${renta_anterior} => ${contrato.monto_renta_actual}"
+                    f" ({aumentos} aumento(s), próximo: {contrato.fecha_proximo_aumento})"
+                )
+
+            if options['simular']:
+                transaction.set_rollback(True) # Deshacemos todo
+                self.stdout.write(self.style.WARNING(f"--- SIMULACIÓN: {len(cambiados)} contratos cambiarían. Nada se guardó. ---"))
+                return
+
+        if cambiados:
+            self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {len(cambiados)} contratos actualizados. ---"))
+        else:
+            self.stdout.write("--- No hay contratos con aumento pendiente. ---")
@@ -0,0 +1,67 @@
+# propiedades/management/commands/archivar_pagos.py
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from propiedades.cache_portal import invalidar_portal_por_contratos
+from propiedades.models import Pago, PagoArchivado
+from propiedades.signals import pagos_borrados_en_lote
+
+class Command(BaseCommand):
+    help = 'Mueve a PagoArchivado los pagos ya pagados de contratos que terminaron hace N meses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int,
+            default=getattr(settings, 'ARCHIVO_PAGOS_MESES', 12),
+            help='Meses que deben pasar desde el fin del contrato.'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=1000,
+            help='Pagos que se mueven por transacción.'
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.now().date()
+        fecha_limite = hoy - relativedelta(months=options['meses'])
+        self.stdout.write(f"--- [ARCHIVAR PAGOS] Contratos terminados antes de {fecha_limite} ---")
+
+        # Solo los ya pagados: los pendientes o vencidos se quedan en la tabla principal
+        por_archivar = Pago.objects.filter(
+            contrato__fecha_fin__lt=fecha_limite,
+            estado='Pagado'
+        ).order_by('pk')
+
+        total = 0
+        while True:
+            # Cada lote se copia y se borra en la misma transacción
+            with transaction.atomic():
+                lote = list(por_archivar[:options['lote']])
+                if not lote:
+                    break
+
+                PagoArchivado.objects.bulk_create([
+                    PagoArchivado(
+                        id=pago.pk, # Conservamos el id original
+                        contrato_id=pago.contrato_id,
+                        monto=pago.monto,
+                        fecha_vencimiento=pago.fecha_vencimiento,
+                        estado=pago.estado,
+                        fecha_pago=pago.fecha_pago,
+                    )
+                    for pago in lote
+                ])
+                with pagos_borrados_en_lote():
+                    Pago.objects.filter(pk__in=[pago.pk for pago in lote]).delete()
+                # El historial del portal cambia: una sola invalidación por lote
+                invalidar_portal_por_contratos({pago.contrato_id for pago in lote})
+
+            total += len(lote)
+            self.stdout.write(f" -> {total} pagos archivados...")
+
+        if total:
+            self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {total} pagos archivados. ---"))
+        else:
+            self.stdout.write("--- No hay pagos para archivar. ---")
@@ -0,0 +1,19 @@
+# propiedades/management/commands/calcular_estadisticas_precio.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from propiedades.analitica import calcular_estadisticas_precio
+from propiedades.paginas_estaticas import generar_todo
+
+class Command(BaseCommand):
+    help = 'Recalcula la mediana y cuartiles del precio por m² por ciudad y tipo de operación.'
+
+    def handle(self, *args, **options):
+        self.stdout.write("--- [ESTADÍSTICAS DE PRECIO] Iniciando ---")
+        total = calcular_estadisticas_precio()
+        self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {total} grupos (ciudad + operación) actualizados. ---"))
+
+        # Los detalles publicados muestran estos datos: se vuelven a generar
+        if getattr(settings, 'PAGINAS_ESTATICAS_ROOT', None):
+            paginas = generar_todo()
+            self.stdout.write(self.style.SUCCESS(f"--- Páginas estáticas regeneradas ({paginas} detalles). ---"))
@@ -0,0 +1,29 @@
+# propiedades/management/commands/calcular_similares.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from propiedades.paginas_estaticas import generar_todo
+from propiedades.similares import calcular_todas
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula las propiedades similares (vecinos más cercanos) de todas las propiedades disponibles. '
+        'Debe correr periódicamente (ej. cada noche con cron): las actualizaciones incrementales '
+        'al guardar una propiedad se desvían poco a poco porque la escala de precios cambia.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k', type=int, default=None,
+            help='Cuántas propiedades similares guardar por propiedad (por defecto SIMILARES_POR_PROPIEDAD).'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("--- [CALCULAR SIMILARES] Iniciando ---")
+        total = calcular_todas(k=options['k'])
+        self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: Se guardaron {total} relaciones de similitud. ---"))
+
+        # Los detalles publicados muestran estos datos: se vuelven a generar
+        if getattr(settings, 'PAGINAS_ESTATICAS_ROOT', None):
+            paginas = generar_todo()
+            self.stdout.write(self.style.SUCCESS(f"--- Páginas estáticas regeneradas ({paginas} detalles). ---"))
@@ -0,0 +1,16 @@
+# propiedades/management/commands/generar_paginas_estaticas.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from propiedades.paginas_estaticas import generar_todo
+
+class Command(BaseCommand):
+    help = 'Genera en HTML las páginas públicas (inicio, renta, venta y detalles) para servirlas sin Django.'
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'PAGINAS_ESTATICAS_ROOT', None):
+            raise CommandError("Configura PAGINAS_ESTATICAS_ROOT en settings.py")
+
+        self.stdout.write(f"--- [PÁGINAS ESTÁTICAS] Generando en {settings.PAGINAS_ESTATICAS_ROOT} ---")
+        total = generar_todo()
+        self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: Inicio, listados y {total} detalles generados. ---"))
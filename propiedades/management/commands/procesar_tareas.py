@@ -0,0 +1,57 @@
+# propiedades/management/commands/procesar_tareas.py
+
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from propiedades.tareas import ejecutar_en_pool, reclamar_tareas
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de tareas: reclama tareas pendientes y las ejecuta en un pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trabajadores', type=int,
+            default=getattr(settings, 'TAREAS_TRABAJADORES', 4),
+            help='Cuántas tareas se ejecutan a la vez.'
+        )
+        parser.add_argument(
+            '--procesos', action='store_true',
+            help='Usa un pool de procesos en lugar de hilos (para trabajo pesado de CPU).'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5,
+            help='Segundos de espera cuando no hay tareas.'
+        )
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Procesa lo que haya pendiente y termina (útil para cron).'
+        )
+
+    def handle(self, *args, **options):
+        trabajadores = options['trabajadores']
+        Pool = ProcessPoolExecutor if options['procesos'] else ThreadPoolExecutor
+
+        # Los procesos hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+
+        self.stdout.write(f"--- [PROCESAR TAREAS] Iniciando con {trabajadores} {'procesos' if options['procesos'] else 'hilos'} ---")
+        total = 0
+
+        with Pool(max_workers=trabajadores) as pool:
+            while True:
+                tareas = reclamar_tareas(limite=trabajadores)
+
+                if not tareas:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                for tarea_id, estado in zip(tareas, pool.map(ejecutar_en_pool, tareas)):
+                    self.stdout.write(f" -> Tarea {tarea_id}: {estado}")
+                total += len(tareas)
+
+        self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {total} tareas procesadas. ---"))
@@ -0,0 +1,38 @@
+# propiedades/management/commands/reconstruir_resumenes.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from propiedades.models import ResumenContrato
+from propiedades.resumenes import recalcular_resumenes
+
+CAMPOS = ('pagos_vencidos', 'monto_adeudado', 'proximo_vencimiento', 'proximo_monto')
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero el ResumenContrato de todos los contratos y reporta diferencias.'
+
+    def handle(self, *args, **options):
+        self.stdout.write("--- [RECONSTRUIR RESÚMENES] Iniciando ---")
+
+        with transaction.atomic():
+            # 1. Foto de lo que mantuvieron las señales
+            antes = {fila[0]: fila[1:] for fila in ResumenContrato.objects.values_list('contrato_id', *CAMPOS)}
+
+            # 2. Reconstrucción completa
+            recalcular_resumenes()
+
+            # 3. Comparamos para detectar resúmenes que se desfasaron
+            despues = {fila[0]: fila[1:] for fila in ResumenContrato.objects.values_list('contrato_id', *CAMPOS)}
+
+        faltantes = [pk for pk in despues if pk not in antes]
+        distintos = [pk for pk in despues if pk in antes and antes[pk] != despues[pk]]
+
+        for pk in distintos:
+            self.stdout.write(f" -> Contrato {pk}: {dict(zip(CAMPOS, antes[pk]))} => {dict(zip(CAMPOS, despues[pk]))}")
+
+        if faltantes:
+            self.stdout.write(f"Se crearon {len(faltantes)} resúmenes que no existían.")
+
+        if distintos:
+            self.stdout.write(self.style.WARNING(f"--- {len(distintos)} resúmenes estaban desfasados y se corrigieron. ---"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {len(despues)} resúmenes verificados, todos al día. ---"))
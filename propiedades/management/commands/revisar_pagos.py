@@ -2,8 +2,15 @@
 
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from propiedades.models import Pago
+from propiedades.models import Pago, RecordatorioEnviado
+from propiedades.resumenes import recalcular_resumenes
+from django.db import IntegrityError, transaction
+from django.db.models import Min, Q
+from functools import reduce
+from itertools import groupby
+import operator
 import datetime
+import logging
 
 # --- ¡Importaciones actualizadas! ---
 from django.core.mail import send_mail
@@ -11,6 +18,8 @@ from django.conf import settings
 from django.template.loader import render_to_string # Para usar plantillas HTML
 from django.utils.html import strip_tags # Para crear la versión de solo-texto
 
+logger = logging.getLogger(__name__)
+
 class Command(BaseCommand):
     help = 'Revisa pagos, marca vencidos y envía recordatorios por email HTML.'
 
@@ -28,63 +37,139 @@ class Command(BaseCommand):
 
         if count_vencidos > 0:
             self.stdout.write(f"¡Se encontraron {count_vencidos} pagos vencidos!")
+            contratos_afectados = list(pagos_vencidos.order_by().values_list('contrato_id', flat=True).distinct())
             pagos_vencidos.update(estado='Vencido')
+            # update() no dispara señales: actualizamos los resúmenes de una vez
+            recalcular_resumenes(contratos_afectados)
             self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {count_vencidos} pagos marcados como 'Vencido'. ---"))
         else:
             self.stdout.write("--- No se encontraron pagos vencidos. Todo en orden. ---")
 
         
-        # --- TAREA 2: ENVIAR RECORDATORIOS (¡Versión HTML!) ---
+        # --- TAREA 2: ENVIAR RECORDATORIOS (Con bitácora y un solo email por inquilino) ---
         self.stdout.write("\n--- Buscando pagos para enviar recordatorios ---")
-        
-        dias_de_aviso = 5
-        fecha_recordatorio = hoy + datetime.timedelta(days=dias_de_aviso)
-        
-        pagos_proximos = Pago.objects.filter(
-            estado='Pendiente',
-            fecha_vencimiento=fecha_recordatorio
-        ).select_related('contrato__inquilino__user')
 
-        count_recordatorios = pagos_proximos.count()
-        
-        if count_recordatorios > 0:
-            self.stdout.write(f"¡Se encontraron {count_recordatorios} pagos que vencen en 5 días!")
-            
-            for pago in pagos_proximos:
-                inquilino = pago.contrato.inquilino
-                
-                if inquilino.email:
-                    
-                    asunto = f"Recordatorio de Pago - Contrato {pago.contrato.propiedad.titulo}"
-                    
-                    # 1. Definimos el "contexto" (las variables para la plantilla)
-                    contexto = {
-                        'pago': pago,
-                        'inquilino': inquilino,
-                    }
-                    
-                    # 2. Renderizamos la plantilla HTML en un string
-                    html_message = render_to_string('propiedades/emails/recordatorio_pago.html', contexto)
-                    
-                    # 3. (Buena práctica) Creamos una versión de solo-texto
-                    plain_message = strip_tags(html_message)
-                    
-                    # 4. ¡Enviamos el email!
-                    send_mail(
-                        asunto,
-                        plain_message, # El mensaje de solo-texto
-                        settings.DEFAULT_FROM_EMAIL, # "De:"
-                        [inquilino.email],             # "Para:"
-                        html_message=html_message, # ¡Aquí adjuntamos la versión HTML!
-                        fail_silently=False,
-                    )
-                    
-                    self.stdout.write(f" -> Email (HTML) enviado a {inquilino.email} por pago de {pago.monto}")
-                
-                else:
-                    self.stdout.write(f" -> ADVERTENCIA: Inquilino {inquilino.nombre_completo} no tiene email.")
-            
-            self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {count_recordatorios} recordatorios procesados. ---"))
-        
+        # Ej. [7, 3, 0, -1] -> se ordena de mayor a menor
+        dias_de_aviso = sorted(set(getattr(settings, 'RECORDATORIOS_PAGO_DIAS', [5])), reverse=True)
+        ventana = getattr(settings, 'RECORDATORIOS_VENTANA_DIAS', 30)
+
+        # Una sola consulta por rango: todo lo que ya "toca" avisar (aunque el cron
+        # se haya saltado algún día), junto con el último aviso que registramos.
+        pagos_por_avisar = Pago.objects.filter(
+            estado__in=['Pendiente', 'Vencido'],
+            fecha_vencimiento__gte=hoy - datetime.timedelta(days=ventana),
+            fecha_vencimiento__lte=hoy + datetime.timedelta(days=dias_de_aviso[0]),
+        ).annotate(
+            ultimo_aviso=Min('recordatorios__dias_aviso') # El desfase más chico ya enviado
+        ).select_related(
+            'contrato__propiedad', 'contrato__inquilino'
+        ).order_by('contrato__inquilino_id', 'fecha_vencimiento')
+
+        pendientes = []
+        for pago in pagos_por_avisar:
+            aviso = self.aviso_correspondiente(pago, hoy, dias_de_aviso)
+            # Solo avisamos si este desfase es más reciente que el último enviado
+            if aviso is not None and (pago.ultimo_aviso is None or aviso < pago.ultimo_aviso):
+                pago.aviso = aviso
+                pendientes.append(pago)
+
+        if not pendientes:
+            self.stdout.write("--- No hay recordatorios pendientes. ---")
+            return
+
+        self.stdout.write(f"¡Se encontraron {len(pendientes)} pagos con recordatorio pendiente!")
+        count_emails = 0
+        count_fallidos = 0
+
+        # Los avisos que tocan solo deciden A QUIÉN se escribe; el email lleva
+        # todo lo que el inquilino debe: sus vencidos (sin importar la ventana)
+        # y lo que vence dentro del aviso más anticipado.
+        inquilinos_a_avisar = {pago.contrato.inquilino_id for pago in pendientes}
+        adeudos = Pago.objects.filter(
+            contrato__inquilino_id__in=inquilinos_a_avisar,
+            estado__in=['Pendiente', 'Vencido'],
+            fecha_vencimiento__lte=hoy + datetime.timedelta(days=dias_de_aviso[0]),
+        ).select_related('contrato__propiedad').order_by('contrato__inquilino_id', 'fecha_vencimiento')
+        adeudos_por_inquilino = {
+            inquilino_id: list(grupo)
+            for inquilino_id, grupo in groupby(adeudos, key=lambda p: p.contrato.inquilino_id)
+        }
+
+        # Un solo email (resumen) por inquilino con todos sus pagos pendientes
+        for inquilino_id, grupo in groupby(pendientes, key=lambda p: p.contrato.inquilino_id):
+            avisos = list(grupo)
+            inquilino = avisos[0].contrato.inquilino
+
+            if not inquilino.email:
+                self.stdout.write(f" -> ADVERTENCIA: Inquilino {inquilino.nombre_completo} no tiene email.")
+                continue
+
+            # Primero la bitácora (en una transacción corta): si otra ejecución ya
+            # avisó, la restricción única lo detecta y no se manda el email dos veces.
+            try:
+                with transaction.atomic():
+                    RecordatorioEnviado.objects.bulk_create([
+                        RecordatorioEnviado(pago=pago, dias_aviso=pago.aviso) for pago in avisos
+                    ])
+            except IntegrityError:
+                self.stdout.write(f" -> {inquilino.email} ya fue avisado por otra ejecución.")
+                continue
+
+            # El envío va fuera de la transacción: en SQLite no detenemos las
+            # escrituras del sitio mientras esperamos al servidor de correo
+            pagos = adeudos_por_inquilino.get(inquilino_id, avisos)
+            try:
+                self.enviar_resumen(inquilino, pagos, hoy)
+            except Exception as error:
+                # Ej. SMTPRecipientsRefused: borramos la bitácora de este inquilino
+                # (se reintenta en la siguiente ejecución) y seguimos con los demás
+                RecordatorioEnviado.objects.filter(reduce(operator.or_, [
+                    Q(pago=pago, dias_aviso=pago.aviso) for pago in avisos
+                ])).delete()
+                logger.exception("No se pudo enviar el recordatorio a %s", inquilino.email)
+                self.stdout.write(self.style.ERROR(f" -> ERROR al enviar a {inquilino.email}: {error}"))
+                count_fallidos += 1
+                continue
+
+            count_emails += 1
+            self.stdout.write(f" -> Email (HTML) enviado a {inquilino.email} con {len(pagos)} pago(s)")
+
+        if count_fallidos:
+            self.stdout.write(self.style.WARNING(f"--- {count_emails} recordatorios enviados, {count_fallidos} fallaron (se reintentarán). ---"))
         else:
-            self.stdout.write("--- No se encontraron pagos que venzan en 5 días. ---")
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(f"--- ÉXITO: {count_emails} recordatorios enviados. ---"))
+
+    def aviso_correspondiente(self, pago, hoy, dias_de_aviso):
+        """
+        Regresa el desfase (en días) que le toca al pago hoy, o None si
+        todavía es muy pronto. Si se juntaron varios (ej. el de 7 y el de 3
+        días), se toma el más cercano al vencimiento.
+        """
+        dias_faltantes = (pago.fecha_vencimiento - hoy).days
+        avisos_cumplidos = [dias for dias in dias_de_aviso if dias_faltantes <= dias]
+        return min(avisos_cumplidos) if avisos_cumplidos else None
+
+    def enviar_resumen(self, inquilino, pagos, hoy):
+        asunto = f"Recordatorio de Pago - {len(pagos)} pago(s) pendiente(s)"
+
+        # 1. Definimos el "contexto" (las variables para la plantilla)
+        contexto = {
+            'inquilino': inquilino,
+            'pagos': pagos,
+            'total': sum(pago.monto for pago in pagos),
+            'hoy': hoy,
+        }
+
+        # 2. Renderizamos la plantilla HTML y su versión de solo-texto
+        html_message = render_to_string('propiedades/emails/recordatorio_pago.html', contexto)
+        plain_message = strip_tags(html_message)
+
+        # 3. ¡Enviamos el email!
+        send_mail(
+            asunto,
+            plain_message,
+            settings.DEFAULT_FROM_EMAIL,
+            [inquilino.email],
+            html_message=html_message,
+            fail_silently=False,
+        )
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0004_pago'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordatorioEnviado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dias_aviso', models.IntegerField(help_text='Días antes del vencimiento (negativo = días de atraso)')),
+                ('fecha_envio', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Recordatorio Enviado',
+                'verbose_name_plural': 'Recordatorios Enviados',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='pago',
+            options={'ordering': ['fecha_vencimiento'], 'verbose_name': 'Pago Mensual', 'verbose_name_plural': 'Pagos Mensuales'},
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['estado', 'fecha_vencimiento'], name='propiedades_estado_e6ac42_idx'),
+        ),
+        migrations.AddField(
+            model_name='recordatorioenviado',
+            name='pago',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recordatorios', to='propiedades.pago'),
+        ),
+        migrations.AddConstraint(
+            model_name='recordatorioenviado',
+            constraint=models.UniqueConstraint(fields=('pago', 'dias_aviso'), name='recordatorio_unico_por_aviso'),
+        ),
+    ]
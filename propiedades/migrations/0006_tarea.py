@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0005_recordatorioenviado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('funcion', models.CharField(help_text='Ruta de la función a ejecutar (ej. propiedades.tareas.generar_pagos_contrato)', max_length=200)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('En proceso', 'En proceso'), ('Completada', 'Completada'), ('Fallida', 'Fallida')], default='Pendiente', max_length=12)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('max_intentos', models.PositiveIntegerField(default=5)),
+                ('ejecutar_despues', models.DateTimeField(default=django.utils.timezone.now)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_en', models.DateTimeField(blank=True, null=True)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Tarea en Segundo Plano',
+                'verbose_name_plural': 'Tareas en Segundo Plano',
+                'ordering': ['ejecutar_despues'],
+                'indexes': [models.Index(fields=['estado', 'ejecutar_despues'], name='propiedades_estado_b60c00_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:44
+
+import propiedades.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0006_tarea'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fotopropiedad',
+            name='imagen',
+            field=models.ImageField(db_index=True, storage=propiedades.storage.AlmacenamientoPorContenido(), upload_to='propiedades/galeria/'),
+        ),
+        migrations.AlterField(
+            model_name='propiedad',
+            name='foto_principal',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=propiedades.storage.AlmacenamientoPorContenido(), upload_to='propiedades/'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:46
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def llenar_resumenes(apps, schema_editor):
+    # Los contratos existentes necesitan su resumen (el portal y el admin lo leen).
+    # Mismo UPDATE con subconsultas que 'recalcular_resumenes', con los modelos históricos.
+    Contrato = apps.get_model('propiedades', 'Contrato')
+    Pago = apps.get_model('propiedades', 'Pago')
+    ResumenContrato = apps.get_model('propiedades', 'ResumenContrato')
+
+    ResumenContrato.objects.bulk_create(
+        [ResumenContrato(contrato_id=pk) for pk in Contrato.objects.values_list('pk', flat=True)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+    vencidos = Pago.objects.filter(
+        contrato=OuterRef('contrato'), estado='Vencido'
+    ).order_by().values('contrato')
+
+    proximo = Pago.objects.filter(
+        contrato=OuterRef('contrato'), estado='Pendiente'
+    ).order_by('fecha_vencimiento')
+
+    ResumenContrato.objects.update(
+        pagos_vencidos=Coalesce(
+            Subquery(vencidos.annotate(total=Count('pk')).values('total'), output_field=IntegerField()),
+            0,
+        ),
+        monto_adeudado=Coalesce(
+            Subquery(vencidos.annotate(total=Sum('monto')).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        proximo_vencimiento=Subquery(proximo.values('fecha_vencimiento')[:1]),
+        proximo_monto=Subquery(proximo.values('monto')[:1]),
+        actualizado=django.utils.timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0007_almacenamiento_por_contenido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenContrato',
+            fields=[
+                ('contrato', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='propiedades.contrato')),
+                ('pagos_vencidos', models.PositiveIntegerField(db_index=True, default=0)),
+                ('monto_adeudado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('proximo_vencimiento', models.DateField(blank=True, null=True)),
+                ('proximo_monto', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Contrato',
+                'verbose_name_plural': 'Resúmenes de Contrato',
+            },
+        ),
+        migrations.RunPython(llenar_resumenes, migrations.RunPython.noop),
+    ]
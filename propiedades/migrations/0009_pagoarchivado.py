@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0008_resumencontrato'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagoArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_vencimiento', models.DateField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Pagado', 'Pagado'), ('Vencido', 'Vencido')], max_length=10)),
+                ('fecha_pago', models.DateField(blank=True, null=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('contrato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos_archivados', to='propiedades.contrato')),
+            ],
+            options={
+                'verbose_name': 'Pago Archivado',
+                'verbose_name_plural': 'Pagos Archivados',
+                'ordering': ['fecha_vencimiento'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0009_pagoarchivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropiedadSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distancia', models.FloatField()),
+                ('propiedad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='propiedades.propiedad')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='propiedades.propiedad')),
+            ],
+            options={
+                'verbose_name': 'Propiedad Similar',
+                'verbose_name_plural': 'Propiedades Similares',
+                'ordering': ['distancia'],
+                'indexes': [models.Index(fields=['propiedad', 'distancia'], name='propiedades_propied_811638_idx')],
+                'constraints': [models.UniqueConstraint(fields=('propiedad', 'similar'), name='propiedad_similar_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0010_propiedadsimilar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ciudad', models.CharField(max_length=100)),
+                ('tipo_operacion', models.CharField(choices=[('Renta', 'Renta'), ('Venta', 'Venta')], max_length=10)),
+                ('conteo', models.PositiveIntegerField()),
+                ('mediana_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cuartil_inferior_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cuartil_superior_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Estadística de Precio',
+                'verbose_name_plural': 'Estadísticas de Precio',
+                'ordering': ['ciudad', 'tipo_operacion'],
+                'constraints': [models.UniqueConstraint(fields=('ciudad', 'tipo_operacion'), name='estadistica_unica_por_ciudad')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:51
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+
+
+def calcular_primer_aumento(apps, schema_editor):
+    # Los contratos existentes arrancan en su primer aumento;
+    # 'aplicar_aumentos' se pone al corriente con los que ya pasaron.
+    Contrato = apps.get_model('propiedades', 'Contrato')
+    for contrato in Contrato.objects.filter(frecuencia_aumento_meses__gt=0):
+        contrato.fecha_proximo_aumento = contrato.fecha_inicio + relativedelta(months=contrato.frecuencia_aumento_meses)
+        contrato.save(update_fields=['fecha_proximo_aumento'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0011_estadisticaprecio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contrato',
+            name='fecha_proximo_aumento',
+            field=models.DateField(blank=True, db_index=True, help_text='Fecha en que se aplicará el siguiente aumento', null=True),
+        ),
+        migrations.RunPython(calcular_primer_aumento, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .storage import almacenamiento_fotos
 
 # --- Modelo 1: Cliente (Inquilino o Propietario) ---
 class Cliente(models.Model):
@@ -48,19 +50,32 @@ class Propiedad(models.Model):
     num_baños = models.PositiveIntegerField(default=1)
     metros_cuadrados = models.PositiveIntegerField(default=50)
 
-    foto_principal = models.ImageField(upload_to='propiedades/', blank=True, null=True)
+    # Las fotos se guardan por contenido: una sola copia aunque se suban varias veces
+    foto_principal = models.ImageField(
+        upload_to='propiedades/',
+        storage=almacenamiento_fotos,
+        blank=True,
+        null=True,
+        db_index=True # Para contar rápido cuántos registros usan cada archivo
+    )
 
     def __str__(self):
         # Esto es lo que veremos en el panel de admin (ej: "Renta: Depto 2 recámaras en Centro")
         return f"{self.tipo_operacion}: {self.titulo}"
 
+    @property
+    def precio_por_m2(self):
+        if not self.metros_cuadrados:
+            return None
+        return self.precio / self.metros_cuadrados
+
 class FotoPropiedad(models.Model):
     propiedad = models.ForeignKey(
         Propiedad,
         on_delete=models.CASCADE, # Si se borra la propiedad, se borran sus fotos
         related_name='fotos_galeria' # Nos permitirá acceder a las fotos desde la propiedad
     )
-    imagen = models.ImageField(upload_to='propiedades/galeria/')
+    imagen = models.ImageField(upload_to='propiedades/galeria/', storage=almacenamiento_fotos, db_index=True)
     descripcion = models.CharField(max_length=255, blank=True)
 
     class Meta:
@@ -70,6 +85,77 @@ class FotoPropiedad(models.Model):
     def __str__(self):
         return f"Foto de {self.propiedad.titulo}"
 
+# --- Estadísticas de precio por ciudad (las calcula 'calcular_estadisticas_precio') ---
+def normalizar_ciudad(ciudad):
+    # "Guadalajara" y " guadalajara" son la misma ciudad (estadísticas y similares)
+    return ciudad.strip().lower()
+
+class EstadisticaPrecio(models.Model):
+    """
+    Mediana y cuartiles del precio por m² de una ciudad y tipo de operación.
+    Sirven de referencia para saber si una propiedad está cara o barata.
+    """
+    ciudad = models.CharField(max_length=100) # Ya normalizada (ver 'normalizar_ciudad')
+    tipo_operacion = models.CharField(max_length=10, choices=Propiedad.OPERACION_CHOICES)
+
+    conteo = models.PositiveIntegerField() # Cuántas propiedades entraron al cálculo
+    mediana_m2 = models.DecimalField(max_digits=12, decimal_places=2)
+    cuartil_inferior_m2 = models.DecimalField(max_digits=12, decimal_places=2) # Percentil 25
+    cuartil_superior_m2 = models.DecimalField(max_digits=12, decimal_places=2) # Percentil 75
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['ciudad', 'tipo_operacion']
+        verbose_name = "Estadística de Precio"
+        verbose_name_plural = "Estadísticas de Precio"
+        constraints = [
+            # Una fila por ciudad y operación (también sirve de índice para buscarla)
+            models.UniqueConstraint(fields=['ciudad', 'tipo_operacion'], name='estadistica_unica_por_ciudad'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo_operacion} en {self.ciudad}: ${self.mediana_m2}/m²"
+
+    def diferencia_porcentual(self, precio_m2):
+        # ej. 12.5 = 12.5% más caro que la mediana; -8 = 8% más barato
+        if precio_m2 is None or not self.mediana_m2:
+            return None
+        return float((precio_m2 - self.mediana_m2) / self.mediana_m2 * 100)
+
+# --- Propiedades similares (vecinos más cercanos ya calculados) ---
+class PropiedadSimilar(models.Model):
+    """
+    Una de las propiedades más parecidas a otra, según precio, tamaño,
+    recámaras, baños y ciudad. Las calcula 'calcular_similares' (ver similares.py)
+    para que 'detalle_propiedad' solo tenga que leerlas.
+    """
+    propiedad = models.ForeignKey(
+        Propiedad,
+        on_delete=models.CASCADE,
+        related_name='similares' # Para hacer propiedad.similares.all()
+    )
+    similar = models.ForeignKey(
+        Propiedad,
+        on_delete=models.CASCADE,
+        related_name='+' # No necesitamos la relación inversa
+    )
+    distancia = models.FloatField() # Mientras más chica, más parecida
+
+    class Meta:
+        ordering = ['distancia']
+        verbose_name = "Propiedad Similar"
+        verbose_name_plural = "Propiedades Similares"
+        indexes = [
+            # La consulta del detalle: las de una propiedad, de la más parecida a la menos
+            models.Index(fields=['propiedad', 'distancia']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['propiedad', 'similar'], name='propiedad_similar_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.propiedad.titulo} ~ {self.similar.titulo}"
+
 # --- Modelo 3: Contrato (La magia que une todo) ---
 class Contrato(models.Model):
     propiedad = models.ForeignKey(
@@ -100,10 +186,26 @@ class Contrato(models.Model):
         help_text="Porcentaje de aumento (ej. 10 para 10%)"
     )
     
-    # fecha_proximo_aumento = models.DateField(blank=True, null=True) # Este lo calcularemos luego
+    fecha_proximo_aumento = models.DateField(
+        blank=True,
+        null=True, # Si se deja vacío, se calcula al guardar (inicio + frecuencia)
+        db_index=True, # 'aplicar_aumentos' busca por esta fecha
+        help_text="Fecha en que se aplicará el siguiente aumento"
+    )
 
     def __str__(self):
         return f"Contrato de {self.propiedad.titulo} para {self.inquilino.nombre_completo}"
+
+    def historial_pagos(self):
+        """
+        Todos los pagos del contrato, los de Pago y los de PagoArchivado,
+        en una sola consulta (UNION) ordenada por fecha de vencimiento.
+        Regresa diccionarios con los mismos campos en ambos casos.
+        """
+        campos = ('id', 'monto', 'fecha_vencimiento', 'estado', 'fecha_pago')
+        activos = self.pagos.order_by().values(*campos)
+        archivados = self.pagos_archivados.order_by().values(*campos)
+        return activos.union(archivados, all=True).order_by('fecha_vencimiento')
     
 class Pago(models.Model):
     ESTADO_PAGO_CHOICES = [
@@ -135,6 +237,132 @@ class Pago(models.Model):
         ordering = ['fecha_vencimiento']
         verbose_name = "Pago Mensual"
         verbose_name_plural = "Pagos Mensuales"
+        # Índice para las búsquedas por rango que hace 'revisar_pagos'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_vencimiento']),
+        ]
 
     def __str__(self):
         return f"Pago de {self.contrato.propiedad.titulo} - {self.fecha_vencimiento}"
+
+# --- Archivo de pagos de contratos terminados ---
+class PagoArchivado(models.Model):
+    """
+    Copia de un Pago ya 'Pagado' de un contrato que terminó hace tiempo.
+    El comando 'archivar_pagos' los mueve aquí para que la tabla Pago
+    (la que consultan el portal, el admin y 'revisar_pagos') no crezca sin fin.
+    Conserva el mismo id que tenía como Pago.
+    """
+    contrato = models.ForeignKey(
+        Contrato,
+        on_delete=models.CASCADE,
+        related_name='pagos_archivados'
+    )
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha_vencimiento = models.DateField()
+    estado = models.CharField(max_length=10, choices=Pago.ESTADO_PAGO_CHOICES)
+    fecha_pago = models.DateField(blank=True, null=True)
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['fecha_vencimiento']
+        verbose_name = "Pago Archivado"
+        verbose_name_plural = "Pagos Archivados"
+
+    def __str__(self):
+        return f"Pago de {self.contrato.propiedad.titulo} - {self.fecha_vencimiento} (archivado)"
+
+# --- Resumen de saldo por contrato (se mantiene al guardar Pagos) ---
+class ResumenContrato(models.Model):
+    """
+    Valores ya calculados del estado de cuenta de un Contrato, para que el
+    portal y el admin no tengan que recorrer todos sus Pagos en cada visita.
+    Lo actualiza 'recalcular_resumenes' (ver resumenes.py).
+    """
+    contrato = models.OneToOneField(
+        Contrato,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resumen' # Para hacer contrato.resumen
+    )
+    pagos_vencidos = models.PositiveIntegerField(default=0, db_index=True)
+    monto_adeudado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    proximo_vencimiento = models.DateField(blank=True, null=True) # Del próximo pago 'Pendiente'
+    proximo_monto = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Resumen de Contrato"
+        verbose_name_plural = "Resúmenes de Contrato"
+
+    def __str__(self):
+        return f"Resumen de {self.contrato}"
+
+# --- Bitácora de recordatorios enviados ---
+class RecordatorioEnviado(models.Model):
+    """
+    Registra cada aviso enviado por 'revisar_pagos' para un Pago.
+    Así el comando puede correr las veces que sea sin mandar duplicados,
+    y si un día no corre, al siguiente se ponen al corriente.
+    """
+    pago = models.ForeignKey(
+        Pago,
+        on_delete=models.CASCADE, # Si se borra el pago, se borra su bitácora
+        related_name='recordatorios'
+    )
+    dias_aviso = models.IntegerField(
+        help_text="Días antes del vencimiento (negativo = días de atraso)"
+    )
+    fecha_envio = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Recordatorio Enviado"
+        verbose_name_plural = "Recordatorios Enviados"
+        constraints = [
+            # Un solo aviso por pago y por desfase
+            models.UniqueConstraint(fields=['pago', 'dias_aviso'], name='recordatorio_unico_por_aviso'),
+        ]
+
+    def __str__(self):
+        return f"Aviso ({self.dias_aviso} días) - {self.pago}"
+
+# --- Cola de tareas en segundo plano (sin broker externo) ---
+class Tarea(models.Model):
+    """
+    Un trabajo pendiente para el comando 'procesar_tareas'.
+    Las señales encolan aquí en lugar de hacer el trabajo dentro de la petición.
+    """
+    ESTADO_CHOICES = [
+        ('Pendiente', 'Pendiente'),
+        ('En proceso', 'En proceso'),
+        ('Completada', 'Completada'),
+        ('Fallida', 'Fallida'),
+    ]
+
+    funcion = models.CharField(
+        max_length=200,
+        help_text="Ruta de la función a ejecutar (ej. propiedades.tareas.generar_pagos_contrato)"
+    )
+    argumentos = models.JSONField(default=dict, blank=True) # {'args': [...], 'kwargs': {...}}
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='Pendiente')
+
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    ejecutar_despues = models.DateTimeField(default=timezone.now) # Para los reintentos con espera
+
+    creada_en = models.DateTimeField(auto_now_add=True)
+    iniciada_en = models.DateTimeField(blank=True, null=True)
+    terminada_en = models.DateTimeField(blank=True, null=True)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['ejecutar_despues']
+        verbose_name = "Tarea en Segundo Plano"
+        verbose_name_plural = "Tareas en Segundo Plano"
+        indexes = [
+            # El worker siempre busca por estado + fecha
+            models.Index(fields=['estado', 'ejecutar_despues']),
+        ]
+
+    def __str__(self):
+        return f"{self.funcion} ({self.estado})"
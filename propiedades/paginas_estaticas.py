@@ -0,0 +1,98 @@
+# propiedades/paginas_estaticas.py
+
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from .models import Propiedad
+
+# Listado de cada tipo de operación (nombre de la URL en propiedades/urls.py)
+LISTADOS = {
+    'Renta': 'pagina-renta',
+    'Venta': 'pagina-venta',
+}
+
+
+def carpeta_destino():
+    return settings.PAGINAS_ESTATICAS_ROOT
+
+
+def renderizar(nombre_url, *args):
+    """
+    Ejecuta la vista pública como si la pidiera un visitante anónimo
+    y regresa (ruta, html).
+    """
+    ruta = reverse(nombre_url, args=args)
+    request = RequestFactory().get(ruta)
+    request.user = AnonymousUser() # Así el menú sale como "Iniciar Sesión"
+
+    coincidencia = resolve(ruta)
+    respuesta = coincidencia.func(request, *coincidencia.args, **coincidencia.kwargs)
+    return ruta, respuesta.content
+
+
+def escribir(ruta, contenido):
+    """
+    Guarda la página como '<ruta>/index.html' dentro de PAGINAS_ESTATICAS_ROOT,
+    que es lo que el servidor web sirve directamente para esa URL.
+    Se escribe a un temporal y luego se reemplaza, así nunca se sirve un archivo a medias.
+    """
+    carpeta = os.path.join(carpeta_destino(), ruta.strip('/'))
+    os.makedirs(carpeta, exist_ok=True)
+
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(contenido)
+    os.chmod(temporal, 0o644)
+    os.replace(temporal, os.path.join(carpeta, 'index.html'))
+
+
+def generar_listados(tipos=('Renta', 'Venta')):
+    """Regenera la página de inicio y los listados de los tipos indicados."""
+    escribir(*renderizar('inicio'))
+    for tipo in tipos:
+        escribir(*renderizar(LISTADOS[tipo]))
+
+
+def generar_detalle(propiedad_id):
+    """Regenera el detalle de una propiedad, o lo borra si la propiedad ya no existe."""
+    if Propiedad.objects.filter(pk=propiedad_id).exists():
+        escribir(*renderizar('detalle', propiedad_id))
+    else:
+        carpeta = os.path.join(carpeta_destino(), reverse('detalle', args=[propiedad_id]).strip('/'))
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def regenerar_por_cambio(propiedad_id, tipos, dependientes=()):
+    """
+    Después de cambiar una Propiedad (o sus fotos) solo se rehacen su detalle,
+    el de las propiedades en cuyo panel de "similares" aparece o aparecía
+    ('dependientes'), la página de inicio y los listados de los tipos afectados.
+    """
+    generar_detalle(propiedad_id)
+    for dependiente in dependientes:
+        generar_detalle(dependiente)
+    if tipos:
+        generar_listados(tipos)
+
+
+def generar_todo():
+    """Regenera todas las páginas públicas y borra los detalles de propiedades que ya no existen."""
+    generar_listados()
+
+    ids = set(Propiedad.objects.values_list('pk', flat=True))
+    for propiedad_id in ids:
+        escribir(*renderizar('detalle', propiedad_id))
+
+    carpeta_detalles = os.path.join(carpeta_destino(), 'propiedad')
+    if os.path.isdir(carpeta_detalles):
+        for nombre in os.listdir(carpeta_detalles):
+            if nombre.isdigit() and int(nombre) not in ids:
+                shutil.rmtree(os.path.join(carpeta_detalles, nombre), ignore_errors=True)
+
+    return len(ids)
@@ -0,0 +1,64 @@
+# propiedades/resumenes.py
+
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_portal import invalidar_portal_por_contratos
+from .models import Contrato, Pago, ResumenContrato
+
+
+def recalcular_resumenes(contrato_ids=None):
+    """
+    Recalcula el ResumenContrato de los contratos indicados
+    (o de todos si 'contrato_ids' es None).
+
+    Todo se hace con un solo UPDATE por lotes usando subconsultas, así que
+    cuesta lo mismo para un contrato que para miles. Solo se leen los Pagos
+    de los contratos afectados. También borra del caché el portal de sus inquilinos.
+    """
+    contratos = Contrato.objects.all()
+    if contrato_ids is not None:
+        contratos = contratos.filter(pk__in=contrato_ids)
+
+    # 1. Nos aseguramos de que exista la fila de resumen
+    ResumenContrato.objects.bulk_create(
+        [ResumenContrato(contrato_id=pk) for pk in contratos.values_list('pk', flat=True)],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+    # 2. Calculamos todo con subconsultas sobre los Pagos de cada contrato
+    # (order_by() vacío: el 'ordering' de Pago no debe entrar al GROUP BY)
+    vencidos = Pago.objects.filter(
+        contrato=OuterRef('contrato'), estado='Vencido'
+    ).order_by().values('contrato')
+
+    proximo = Pago.objects.filter(
+        contrato=OuterRef('contrato'), estado='Pendiente'
+    ).order_by('fecha_vencimiento')
+
+    resumenes = ResumenContrato.objects.all()
+    if contrato_ids is not None:
+        resumenes = resumenes.filter(contrato__in=contrato_ids)
+
+    actualizados = resumenes.update(
+        pagos_vencidos=Coalesce(
+            Subquery(vencidos.annotate(total=Count('pk')).values('total'), output_field=IntegerField()),
+            0,
+        ),
+        monto_adeudado=Coalesce(
+            Subquery(vencidos.annotate(total=Sum('monto')).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        proximo_vencimiento=Subquery(proximo.values('fecha_vencimiento')[:1]),
+        proximo_monto=Subquery(proximo.values('monto')[:1]),
+        actualizado=timezone.now(),
+    )
+
+    # El portal de esos inquilinos muestra el resumen: hay que regenerarlo
+    invalidar_portal_por_contratos(contrato_ids)
+    return actualizados
@@ -1,80 +1,185 @@
 # propiedades/signals.py
 
-from django.db.models.signals import post_save
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Contrato, Pago
-from dateutil.relativedelta import relativedelta # La herramienta que instalamos
-from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from .cache_portal import invalidar_portal, invalidar_portal_por_contratos, invalidar_portal_por_propiedad
+from .models import Cliente, Contrato, FotoPropiedad, Pago, Propiedad, PropiedadSimilar
+from .resumenes import recalcular_resumenes
+from .tareas import actualizar_propiedad, encolar, generar_pagos_contrato, limpiar_foto_huerfana
+
+@receiver(pre_save, sender=Contrato)
+def calcular_proximo_aumento(sender, instance, **kwargs):
+    # El primer aumento toca 'frecuencia_aumento_meses' después del inicio
+    if instance.fecha_proximo_aumento is None and instance.frecuencia_aumento_meses:
+        instance.fecha_proximo_aumento = instance.fecha_inicio + relativedelta(months=instance.frecuencia_aumento_meses)
 
 # Esta es la función que se "disparará"
 # @receiver le dice a Django: "Escucha la señal 'post_save' del modelo 'Contrato'"
 @receiver(post_save, sender=Contrato)
 def crear_pagos_mensuales(sender, instance, created, **kwargs):
     """
-    Crea automáticamente los registros de Pago mensuales 
+    Encola la creación de los registros de Pago mensuales
     cuando se crea un nuevo Contrato.
-    (Versión Corregida)
+    El trabajo lo hace el comando 'procesar_tareas', fuera de la petición.
     """
-    
     if created:
-        
-        print(f"--- SEÑAL RECIBIDA: Creando pagos para el contrato de {instance.propiedad.titulo} ---")
-        
-        contrato = instance
-        fecha_actual = contrato.fecha_inicio
-        fecha_fin = contrato.fecha_fin
-        dia_pago = contrato.dia_pago_mensual
-        
-        # --- LÓGICA DE MONTO CORREGIDA ---
-        # Usamos 'monto_base' para el cálculo y 'monto_a_pagar' para el pago
-        monto_base = contrato.monto_renta_actual
-        monto_a_pagar = contrato.monto_renta_actual # <--- Esta es la variable que usaremos
-        
-        frecuencia_aumento = contrato.frecuencia_aumento_meses
-        porcentaje_aumento = Decimal(contrato.porcentaje_aumento / 100)
-        mes_contador = 0
-        # --- FIN LÓGICA CORREGIDA ---
-        
-        pagos_a_crear = []
-        
-        try:
-            fecha_pago_actual = fecha_actual.replace(day=dia_pago)
-        except ValueError:
-            primer_dia_mes_siguiente = fecha_actual.replace(day=1) + relativedelta(months=1)
-            fecha_pago_actual = primer_dia_mes_siguiente - relativedelta(days=1)
-
-        if fecha_actual.day > dia_pago:
-            fecha_pago_actual += relativedelta(months=1)
-        
-        while fecha_pago_actual <= fecha_fin:
-            
-            mes_contador += 1
-            
-            if mes_contador > 1 and (mes_contador - 1) % frecuencia_aumento == 0:
-                # Calculamos el aumento sobre el monto base
-                aumento = monto_base * porcentaje_aumento
-                # Actualizamos el monto base Y el monto a pagar
-                monto_base = (monto_base + aumento).quantize(Decimal('0.01'))
-                monto_a_pagar = monto_base # Asignamos el nuevo monto
-                
-                print(f"--- ¡AUMENTO APLICADO! Nuevo monto {monto_a_pagar} en el mes {mes_contador} ---")
-            else:
-                # Si no hay aumento, nos aseguramos de usar el monto actual
-                monto_a_pagar = monto_base
-            
-            pagos_a_crear.append(
-                Pago(
-                    contrato=contrato,
-                    monto=monto_a_pagar, # <--- Usamos la variable 'monto_a_pagar'
-                    fecha_vencimiento=fecha_pago_actual,
-                    estado='Pendiente'
-                )
-            )
-            
-            fecha_pago_actual += relativedelta(months=1)
-        
-        if pagos_a_crear:
-            Pago.objects.bulk_create(pagos_a_crear)
-            print(f"--- ÉXITO: Se crearon {len(pagos_a_crear)} pagos. ---")
-        else:
-            print("--- ADVERTENCIA: No se generaron pagos (revisar fechas). ---")
\ No newline at end of file
+        encolar(generar_pagos_contrato, instance.pk)
+
+# --- Propiedades similares y páginas públicas pre-generadas ---
+@receiver(pre_save, sender=Propiedad)
+def recordar_propiedad_anterior(sender, instance, **kwargs):
+    # Una sola consulta para lo que necesitan los post_save: la foto anterior
+    # (para limpiarla si se reemplazó) y el tipo anterior (si cambia de Renta
+    # a Venta, hay que rehacer los dos listados)
+    instance._foto_anterior = instance._tipo_anterior = None
+    if instance.pk:
+        instance._foto_anterior, instance._tipo_anterior = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('foto_principal', 'tipo_operacion').first() or (None, None)
+
+@receiver(post_save, sender=Propiedad)
+def actualizar_similares_y_paginas(sender, instance, **kwargs):
+    # Una sola tarea: el worker pone al día las similares (con NumPy) y
+    # luego las páginas, así nunca se publica un panel de similares viejo
+    tipos = {instance.tipo_operacion, getattr(instance, '_tipo_anterior', None)} - {None}
+    encolar(actualizar_propiedad, instance.pk, sorted(tipos))
+
+@receiver(pre_delete, sender=Propiedad)
+def recordar_listas_de_similares(sender, instance, **kwargs):
+    # El borrado en cascada se lleva sus filas de PropiedadSimilar: antes
+    # anotamos en qué listas estaba para rehacerlas (y sus páginas)
+    instance._en_listas = list(
+        PropiedadSimilar.objects.filter(similar_id=instance.pk).values_list('propiedad_id', flat=True)
+    )
+
+@receiver(post_delete, sender=Propiedad)
+def actualizar_similares_por_borrado(sender, instance, **kwargs):
+    encolar(actualizar_propiedad, instance.pk, [instance.tipo_operacion], getattr(instance, '_en_listas', []))
+
+# --- Páginas públicas pre-generadas (ver paginas_estaticas.py) ---
+def regenerar_paginas(propiedad_id, tipos):
+    if getattr(settings, 'PAGINAS_ESTATICAS_ROOT', None): # None = desactivado
+        encolar('propiedades.paginas_estaticas.regenerar_por_cambio', propiedad_id, sorted(tipos))
+
+@receiver(post_save, sender=FotoPropiedad)
+@receiver(post_delete, sender=FotoPropiedad)
+def regenerar_paginas_galeria(sender, instance, **kwargs):
+    # La galería solo aparece en el detalle
+    regenerar_paginas(instance.propiedad_id, set())
+
+# --- Resumen de saldo por contrato ---
+@receiver(post_save, sender=Pago)
+def actualizar_resumen_contrato(sender, instance, **kwargs):
+    """
+    Cuando cambia un Pago, recalcula solo el resumen de su contrato.
+    Se hace al confirmar la transacción: si el contrato entero se está
+    borrando, para entonces ya no existe y no hay nada que recalcular.
+    """
+    contrato_id = instance.contrato_id
+    transaction.on_commit(lambda: recalcular_resumenes([contrato_id]))
+
+# Por hilo: los workers de 'procesar_tareas' pueden borrar pagos a la vez
+_borrado_en_lote = threading.local()
+
+@contextmanager
+def pagos_borrados_en_lote():
+    """
+    Dentro de este bloque, borrar un Pago 'Pagado' no invalida el portal fila
+    por fila (una consulta y un on_commit por pago). Quien lo usa debe llamar
+    a 'invalidar_portal_por_contratos' una vez por lote (ej. 'archivar_pagos').
+    """
+    _borrado_en_lote.activo = True
+    try:
+        yield
+    finally:
+        _borrado_en_lote.activo = False
+
+@receiver(post_delete, sender=Pago)
+def actualizar_resumen_por_borrado(sender, instance, **kwargs):
+    # Un pago 'Pagado' no cuenta en el resumen (ej. al archivarlo): no hay nada que recalcular
+    if instance.estado != 'Pagado':
+        actualizar_resumen_contrato(sender, instance, **kwargs)
+    elif not getattr(_borrado_en_lote, 'activo', False):
+        # Pero sí sale del historial del portal
+        invalidar_portal_por_contratos([instance.contrato_id])
+
+
+# --- Limpieza de fotos (el almacenamiento es por contenido y se comparte) ---
+
+# Campo de imagen de cada modelo que usa 'almacenamiento_fotos'
+CAMPOS_DE_FOTO = {
+    Propiedad: 'foto_principal',
+    FotoPropiedad: 'imagen',
+}
+
+def borrar_foto_si_huerfana(nombre):
+    """
+    Borra el archivo solo si ya ningún registro lo usa (conteo de referencias).
+    Se hace al confirmar la transacción, para no perder la foto si hay rollback.
+    La carrera con subidas del mismo contenido la resuelve el almacenamiento
+    (ver storage.py y 'limpiar_foto_huerfana').
+    """
+    if nombre:
+        transaction.on_commit(lambda: limpiar_foto_huerfana(nombre))
+
+@receiver(pre_save, sender=FotoPropiedad)
+def recordar_foto_anterior(sender, instance, **kwargs):
+    # Guardamos el nombre anterior para saber si la foto se reemplazó
+    # (en Propiedad lo hace 'recordar_propiedad_anterior')
+    instance._foto_anterior = None
+    if instance.pk:
+        instance._foto_anterior = sender.objects.filter(pk=instance.pk).values_list('imagen', flat=True).first()
+
+@receiver(post_save, sender=Propiedad)
+@receiver(post_save, sender=FotoPropiedad)
+def limpiar_foto_reemplazada(sender, instance, **kwargs):
+    archivo = getattr(instance, CAMPOS_DE_FOTO[sender])
+    anterior = getattr(instance, '_foto_anterior', None)
+    if anterior and anterior != archivo.name:
+        borrar_foto_si_huerfana(anterior)
+
+@receiver(post_delete, sender=Propiedad)
+@receiver(post_delete, sender=FotoPropiedad)
+def limpiar_foto_borrada(sender, instance, **kwargs):
+    archivo = getattr(instance, CAMPOS_DE_FOTO[sender])
+    borrar_foto_si_huerfana(archivo.name)
+
+# --- Caché del portal del inquilino (ver cache_portal.py) ---
+# Los cambios de Pago ya invalidan el portal a través de 'recalcular_resumenes'
+# (menos el borrado de un pago 'Pagado', ver 'actualizar_resumen_por_borrado').
+
+@receiver(pre_save, sender=Cliente)
+def recordar_usuario_anterior(sender, instance, **kwargs):
+    # Si el Cliente se enlaza a otro usuario, el portal del anterior también cambia
+    instance._user_anterior = None
+    if instance.pk:
+        instance._user_anterior = sender.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_portal_cliente(sender, instance, **kwargs):
+    invalidar_portal([instance.user_id, getattr(instance, '_user_anterior', None)])
+
+@receiver(pre_save, sender=Contrato)
+def recordar_inquilino_anterior(sender, instance, **kwargs):
+    # Si el contrato pasa a otro inquilino, el portal del anterior también cambia
+    instance._inquilino_anterior = None
+    if instance.pk:
+        instance._inquilino_anterior = sender.objects.filter(pk=instance.pk).values_list('inquilino_id', flat=True).first()
+
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Contrato)
+def invalidar_portal_contrato(sender, instance, **kwargs):
+    inquilinos = [instance.inquilino_id, getattr(instance, '_inquilino_anterior', None)]
+    invalidar_portal(Cliente.objects.filter(pk__in=inquilinos).values_list('user_id', flat=True))
+
+@receiver(post_save, sender=Propiedad)
+def invalidar_portal_propiedad(sender, instance, **kwargs):
+    # El portal muestra el título de la propiedad de cada contrato
+    invalidar_portal_por_propiedad(instance.pk)
@@ -0,0 +1,202 @@
+# propiedades/similares.py
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from .models import Propiedad, PropiedadSimilar, normalizar_ciudad
+
+# Una ciudad distinta pesa como ~2 desviaciones estándar de diferencia en precio o tamaño
+PESO_CIUDAD = 2.0
+
+# Filas de la matriz que se comparan a la vez (limita la memoria: LOTE x N distancias)
+LOTE = 1024
+
+
+def vecinos_por_propiedad():
+    return getattr(settings, 'SIMILARES_POR_PROPIEDAD', 4)
+
+
+def matriz_de_caracteristicas(tipo_operacion):
+    """
+    Regresa (ids, matriz) de las propiedades Disponibles de un tipo de operación.
+    Solo comparamos Renta con Renta y Venta con Venta: sus precios no se parecen.
+
+    Columnas: precio y m² (en escala logarítmica), recámaras y baños,
+    todas estandarizadas, más una columna por ciudad (one-hot).
+    """
+    filas = list(Propiedad.objects.filter(
+        estado='Disponible', tipo_operacion=tipo_operacion
+    ).order_by('pk').values_list(
+        'pk', 'precio', 'metros_cuadrados', 'num_habitaciones', 'num_baños', 'ciudad'
+    ))
+    if not filas:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+
+    ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+    numericas = np.array([fila[1:5] for fila in filas], dtype=np.float64)
+
+    # Una diferencia de $1,000 pesa más en un depto barato que en una casa cara
+    numericas[:, :2] = np.log1p(numericas[:, :2])
+
+    numericas = estandarizar(numericas)
+
+    ciudades = np.array([normalizar_ciudad(fila[5]) for fila in filas])
+    _, ciudad_idx = np.unique(ciudades, return_inverse=True)
+    por_ciudad = np.zeros((len(filas), ciudad_idx.max() + 1))
+    por_ciudad[np.arange(len(filas)), ciudad_idx] = PESO_CIUDAD
+
+    return ids, np.hstack([numericas, por_ciudad])
+
+
+def estandarizar(numericas):
+    """
+    Cada columna a media 0 y desviación 1. La escala sale de las propiedades
+    actuales, así que cambia un poco con cada propiedad que cambia: las
+    actualizaciones incrementales se desvían de a poco y 'calcular_similares'
+    las vuelve a alinear (por eso debe correr periódicamente).
+    """
+    desviacion = numericas.std(axis=0)
+    desviacion[desviacion == 0] = 1 # Columnas constantes (ej. todas con 1 baño)
+    return (numericas - numericas.mean(axis=0)) / desviacion
+
+
+def distancias(consultas, matriz):
+    """
+    Distancia euclidiana al cuadrado entre cada fila de 'consultas' y cada
+    fila de 'matriz', usando |a|² + |b|² - 2ab (una multiplicación de matrices).
+    """
+    d2 = (
+        (consultas ** 2).sum(axis=1)[:, None]
+        + (matriz ** 2).sum(axis=1)[None, :]
+        - 2 * consultas @ matriz.T
+    )
+    return np.maximum(d2, 0) # Evita negativos chiquitos por redondeo
+
+
+def vecinos(ids, matriz, posiciones, kk):
+    """
+    Filas de PropiedadSimilar con los 'kk' vecinos más cercanos de las
+    propiedades en 'posiciones' (índices de 'ids' y de la matriz).
+    """
+    filas = []
+
+    # Por lotes de filas, para no armar la matriz N x N completa
+    for inicio in range(0, len(posiciones), LOTE):
+        lote = posiciones[inicio:inicio + LOTE]
+        d2 = distancias(matriz[lote], matriz)
+        d2[np.arange(len(lote)), lote] = np.inf # Una propiedad no es "similar" a sí misma
+
+        cercanos = np.argpartition(d2, kk - 1, axis=1)[:, :kk]
+        for fila, columnas in enumerate(cercanos):
+            for columna in columnas:
+                filas.append(PropiedadSimilar(
+                    propiedad_id=int(ids[lote[fila]]),
+                    similar_id=int(ids[columna]),
+                    distancia=float(np.sqrt(d2[fila, columna])),
+                ))
+
+    return filas
+
+
+def calcular_todas(k=None):
+    """
+    Recalcula desde cero los k vecinos más cercanos de todas las
+    propiedades Disponibles y reemplaza la tabla PropiedadSimilar.
+    """
+    k = k or vecinos_por_propiedad()
+    filas = []
+
+    for tipo_operacion, _ in Propiedad.OPERACION_CHOICES:
+        ids, matriz = matriz_de_caracteristicas(tipo_operacion)
+        kk = min(k, len(ids) - 1)
+        if kk < 1:
+            continue
+        filas.extend(vecinos(ids, matriz, np.arange(len(ids)), kk))
+
+    with transaction.atomic():
+        PropiedadSimilar.objects.all().delete()
+        PropiedadSimilar.objects.bulk_create(filas, batch_size=1000)
+
+    return len(filas)
+
+
+def actualizar_propiedad(propiedad_id, k=None, afectadas=()):
+    """
+    Actualización incremental cuando cambia o se borra una Propiedad.
+    Regresa los ids de las propiedades cuya lista de similares cambió.
+
+    - Las listas que la contenían se rehacen desde la matriz: al cambiar
+      (o dejar de estar Disponible) puede que ya no sea de sus k más cercanos,
+      y no sabemos quién ocupa su lugar sin volver a medir. Si se borró,
+      esas filas ya no existen: las listas llegan en 'afectadas'.
+    - Recalcula sus propios k vecinos.
+    - En las demás listas entra solo si ahora se parece más que su vecino
+      menos parecido (y saca a ese vecino).
+
+    Las listas que no se tocan conservan las distancias de la escala anterior
+    (ver 'estandarizar'); con una escala fija el resultado es idéntico a
+    'calcular_todas'.
+    """
+    k = k or vecinos_por_propiedad()
+
+    with transaction.atomic():
+        afectadas = list(set(afectadas) | set(
+            PropiedadSimilar.objects.filter(similar_id=propiedad_id).values_list('propiedad_id', flat=True)
+        ))
+        PropiedadSimilar.objects.filter(Q(propiedad_id=propiedad_id) | Q(similar_id=propiedad_id)).delete()
+
+        propiedad = Propiedad.objects.filter(pk=propiedad_id, estado='Disponible').first()
+
+        # Si cambió de tipo de operación, las listas afectadas son del tipo anterior
+        tipos = set(Propiedad.objects.filter(pk__in=afectadas).values_list('tipo_operacion', flat=True))
+        if propiedad is not None:
+            tipos.add(propiedad.tipo_operacion)
+
+        nuevas = []
+        cambiadas = set()
+        for tipo_operacion in tipos:
+            ids, matriz = matriz_de_caracteristicas(tipo_operacion)
+            kk = min(k, len(ids) - 1)
+            if kk < 1:
+                continue
+
+            rehacer = np.isin(ids, afectadas)
+
+            if propiedad is not None and propiedad.tipo_operacion == tipo_operacion:
+                posicion = int(np.searchsorted(ids, propiedad_id)) # 'ids' viene ordenado por pk
+                d = np.sqrt(distancias(matriz[posicion:posicion + 1], matriz)[0])
+
+                actuales = PropiedadSimilar.objects.filter(
+                    propiedad__estado='Disponible', propiedad__tipo_operacion=tipo_operacion
+                ).order_by().values('propiedad').annotate(peor=Max('distancia'), total=Count('pk'))
+                peor = np.full(len(ids), np.inf)
+                total = np.zeros(len(ids), dtype=np.int64)
+                for fila in actuales:
+                    i = int(np.searchsorted(ids, fila['propiedad']))
+                    if i < len(ids) and ids[i] == fila['propiedad']:
+                        peor[i], total[i] = fila['peor'], fila['total']
+
+                # Sus propios vecinos, y las listas incompletas (ej. hay menos de k+1
+                # propiedades de este tipo), también se rehacen completas
+                rehacer |= total < kk
+                rehacer[posicion] = True
+
+                for i in np.flatnonzero((d < peor) & ~rehacer):
+                    # Sacamos al vecino menos parecido para dejar lugar
+                    PropiedadSimilar.objects.filter(propiedad_id=int(ids[i])).order_by('-distancia').first().delete()
+                    nuevas.append(PropiedadSimilar(
+                        propiedad_id=int(ids[i]), similar_id=propiedad_id, distancia=float(d[i])
+                    ))
+
+            posiciones = np.flatnonzero(rehacer)
+            PropiedadSimilar.objects.filter(propiedad_id__in=ids[posiciones].tolist()).delete()
+            nuevas.extend(vecinos(ids, matriz, posiciones, kk))
+
+        PropiedadSimilar.objects.bulk_create(nuevas, batch_size=1000)
+        cambiadas.update(fila.propiedad_id for fila in nuevas)
+
+    # Las listas que la perdieron también cambiaron, aunque ya no se puedan rehacer
+    # (ej. la dueña de la lista dejó de estar Disponible)
+    return (cambiadas | set(afectadas)) - {propiedad_id}
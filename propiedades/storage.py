@@ -0,0 +1,104 @@
+# propiedades/storage.py
+
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+@deconstructible
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    Guarda cada archivo con el hash (SHA-256) de su contenido como nombre:
+    'propiedades/contenido/ab/abcdef...jpg'.
+
+    Si la misma foto se sube dos veces (como principal y en la galería, o en
+    otra propiedad), solo existe una copia en disco y ambos registros apuntan
+    a ella. Como el nombre depende del contenido, cualquier derivado
+    (miniaturas, etc.) se puede generar una sola vez por hash.
+
+    Carrera con la limpieza: una subida que encuentra el archivo ya en disco
+    no escribe nada, pero su registro todavía no está confirmado. Si en ese
+    momento se borra el último registro que usaba el archivo, la limpieza no
+    ve referencias y lo borraría, dejando al registro nuevo sin foto. Para
+    evitarlo, la verificación de la subida y el borrado usan el mismo
+    candado ('bloqueo'), la subida renueva la fecha del archivo, y
+    'borrar_si_huerfano' no borra archivos de hace menos de
+    FOTOS_GRACIA_SEGUNDOS (la limpieza se reintenta después desde la cola).
+    Así nunca queda un registro sin archivo.
+    """
+
+    def __init__(self, prefijo='propiedades/contenido', **kwargs):
+        self.prefijo = prefijo
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.location, exist_ok=True)
+
+        # 1. Copiamos a un temporal mientras calculamos el hash (sin cargar todo en memoria)
+        huella = hashlib.sha256()
+        descriptor, ruta_temporal = tempfile.mkstemp(dir=self.location, suffix='.subiendo')
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                for chunk in content.chunks():
+                    huella.update(chunk)
+                    destino.write(chunk)
+
+            digest = huella.hexdigest()
+            nombre = f"{self.prefijo}/{digest[:2]}/{digest}{extension}"
+            ruta_final = self.path(nombre)
+
+            # 2. Si ya teníamos ese contenido, descartamos la copia nueva
+            #    (con el candado: la limpieza no puede borrarlo a la mitad)
+            with self.bloqueo():
+                if os.path.exists(ruta_final):
+                    os.remove(ruta_temporal)
+                    os.utime(ruta_final) # "Reutilizado ahora": la limpieza lo respeta un rato
+                else:
+                    os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+                    os.replace(ruta_temporal, ruta_final) # Atómico: nunca queda un archivo a medias
+                    if self.file_permissions_mode is not None:
+                        os.chmod(ruta_final, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            raise
+
+        return nombre
+
+    @contextmanager
+    def bloqueo(self):
+        """Candado entre procesos (archivo '.bloqueo' en la carpeta de medios)."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, '.bloqueo'), 'ab') as archivo:
+            locks.lock(archivo, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(archivo)
+
+    def borrar_si_huerfano(self, nombre, en_uso):
+        """
+        Borra 'nombre' si 'en_uso()' dice que ningún registro lo usa y no fue
+        reutilizado por una subida reciente (que quizá aún no confirma su registro).
+        Regresa 'borrado', 'en_uso' o 'reciente' (hay que volver a intentar más tarde).
+        """
+        gracia = getattr(settings, 'FOTOS_GRACIA_SEGUNDOS', 600)
+        with self.bloqueo():
+            if not self.exists(nombre):
+                return 'borrado'
+            if en_uso():
+                return 'en_uso'
+            if time.time() - os.path.getmtime(self.path(nombre)) < gracia:
+                return 'reciente'
+            self.delete(nombre)
+            return 'borrado'
+
+# Instancia compartida por 'foto_principal' y 'FotoPropiedad.imagen'
+almacenamiento_fotos = AlmacenamientoPorContenido()
@@ -0,0 +1,227 @@
+# propiedades/tareas.py
+
+import datetime
+import logging
+from decimal import ROUND_HALF_UP, Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Contrato, FotoPropiedad, Pago, Propiedad, Tarea
+from .resumenes import recalcular_resumenes
+from .storage import almacenamiento_fotos
+
+logger = logging.getLogger(__name__)
+
+
+# --- La cola: encolar, reclamar y ejecutar ---
+
+def encolar(funcion, *args, **kwargs):
+    """
+    Guarda una tarea para que la ejecute el comando 'procesar_tareas'.
+    'funcion' puede ser la función misma o su ruta como texto.
+    Los argumentos deben poder guardarse como JSON (ids, textos, números).
+    """
+    if not isinstance(funcion, str):
+        funcion = f"{funcion.__module__}.{funcion.__qualname__}"
+
+    return Tarea.objects.create(
+        funcion=funcion,
+        argumentos={'args': list(args), 'kwargs': kwargs},
+    )
+
+
+def encolar_despues(segundos, funcion, *args, **kwargs):
+    """Igual que 'encolar', pero la tarea no corre antes de 'segundos'."""
+    tarea = encolar(funcion, *args, **kwargs)
+    tarea.ejecutar_despues = timezone.now() + datetime.timedelta(seconds=segundos)
+    tarea.save(update_fields=['ejecutar_despues'])
+    return tarea
+
+
+def reclamar_tareas(limite):
+    """
+    Marca como 'En proceso' hasta 'limite' tareas listas y regresa sus ids.
+
+    Cada tarea se reclama con un UPDATE condicionado a su estado anterior,
+    así dos workers nunca toman la misma (funciona igual en SQLite).
+    Las tareas que se quedaron 'En proceso' más del tiempo límite
+    (ej. el worker se cayó) se vuelven a tomar.
+    """
+    ahora = timezone.now()
+    tiempo_limite = datetime.timedelta(minutes=getattr(settings, 'TAREAS_TIEMPO_LIMITE_MINUTOS', 30))
+
+    candidatas = Tarea.objects.filter(
+        Q(estado='Pendiente', ejecutar_despues__lte=ahora)
+        | Q(estado='En proceso', iniciada_en__lt=ahora - tiempo_limite)
+    ).values_list('pk', 'estado', 'iniciada_en')[:limite]
+
+    reclamadas = []
+    for pk, estado, iniciada_en in candidatas:
+        actualizadas = Tarea.objects.filter(
+            pk=pk, estado=estado, iniciada_en=iniciada_en
+        ).update(
+            estado='En proceso',
+            iniciada_en=ahora,
+            intentos=F('intentos') + 1,
+        )
+        if actualizadas: # Si es 0, otro worker la ganó
+            reclamadas.append(pk)
+
+    return reclamadas
+
+
+def ejecutar_tarea(tarea_id):
+    """
+    Ejecuta una tarea ya reclamada. Si falla, la reprograma con espera
+    exponencial (30s, 60s, 120s...) hasta agotar 'max_intentos'.
+    """
+    tarea = Tarea.objects.get(pk=tarea_id)
+
+    try:
+        funcion = import_string(tarea.funcion)
+        funcion(*tarea.argumentos.get('args', []), **tarea.argumentos.get('kwargs', {}))
+    except Exception as error:
+        logger.exception("Falló la tarea %s (intento %s)", tarea, tarea.intentos)
+        tarea.ultimo_error = f"{type(error).__name__}: {error}"
+
+        if tarea.intentos >= tarea.max_intentos:
+            tarea.estado = 'Fallida'
+            tarea.terminada_en = timezone.now()
+        else:
+            espera = getattr(settings, 'TAREAS_REINTENTO_SEGUNDOS', 30) * 2 ** (tarea.intentos - 1)
+            tarea.estado = 'Pendiente'
+            tarea.ejecutar_despues = timezone.now() + datetime.timedelta(seconds=espera)
+    else:
+        tarea.estado = 'Completada'
+        tarea.terminada_en = timezone.now()
+        tarea.ultimo_error = ''
+
+    tarea.save(update_fields=['estado', 'ejecutar_despues', 'terminada_en', 'ultimo_error'])
+    return tarea.estado
+
+
+def ejecutar_en_pool(tarea_id):
+    """
+    Punto de entrada para los hilos/procesos del worker.
+    Cada hilo o proceso abre su propia conexión, así que la cerramos al terminar.
+    """
+    import django
+    django.setup() # No hace nada si Django ya está listo (hilos o procesos con 'fork')
+
+    try:
+        return ejecutar_tarea(tarea_id)
+    finally:
+        connections.close_all()
+
+
+# --- Tareas de la aplicación ---
+
+def generar_pagos_contrato(contrato_id):
+    """
+    Crea los registros de Pago mensuales de un Contrato nuevo,
+    aplicando el aumento cada 'frecuencia_aumento_meses'.
+    """
+    try:
+        contrato = Contrato.objects.select_related('propiedad').get(pk=contrato_id)
+    except Contrato.DoesNotExist:
+        return # El contrato se borró antes de que corriera la tarea
+
+    # Si la tarea se reintenta, no duplicamos los pagos
+    if contrato.pagos.exists():
+        return
+
+    fecha_actual = contrato.fecha_inicio
+    fecha_fin = contrato.fecha_fin
+    dia_pago = contrato.dia_pago_mensual
+
+    # Usamos 'monto_base' para el cálculo y 'monto_a_pagar' para el pago
+    monto_base = contrato.monto_renta_actual
+    monto_a_pagar = contrato.monto_renta_actual
+
+    frecuencia_aumento = contrato.frecuencia_aumento_meses
+    porcentaje_aumento = Decimal(contrato.porcentaje_aumento / 100)
+    mes_contador = 0
+
+    pagos_a_crear = []
+
+    try:
+        fecha_pago_actual = fecha_actual.replace(day=dia_pago)
+    except ValueError:
+        primer_dia_mes_siguiente = fecha_actual.replace(day=1) + relativedelta(months=1)
+        fecha_pago_actual = primer_dia_mes_siguiente - relativedelta(days=1)
+
+    if fecha_actual.day > dia_pago:
+        fecha_pago_actual += relativedelta(months=1)
+
+    while fecha_pago_actual <= fecha_fin:
+
+        mes_contador += 1
+
+        if mes_contador > 1 and (mes_contador - 1) % frecuencia_aumento == 0:
+            # Calculamos el aumento sobre el monto base
+            aumento = monto_base * porcentaje_aumento
+            # Medio centavo hacia arriba, igual que 'aplicar_aumentos'
+            monto_base = (monto_base + aumento).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            monto_a_pagar = monto_base
+
+            logger.info("Aumento aplicado: nuevo monto %s en el mes %s", monto_a_pagar, mes_contador)
+        else:
+            monto_a_pagar = monto_base
+
+        pagos_a_crear.append(
+            Pago(
+                contrato=contrato,
+                monto=monto_a_pagar,
+                fecha_vencimiento=fecha_pago_actual,
+                estado='Pendiente'
+            )
+        )
+
+        fecha_pago_actual += relativedelta(months=1)
+
+    if pagos_a_crear:
+        with transaction.atomic():
+            Pago.objects.bulk_create(pagos_a_crear)
+            recalcular_resumenes([contrato.pk]) # bulk_create no dispara señales
+        logger.info("Se crearon %s pagos para el contrato de %s", len(pagos_a_crear), contrato.propiedad.titulo)
+    else:
+        logger.warning("No se generaron pagos para el contrato %s (revisar fechas)", contrato.pk)
+
+
+def foto_en_uso(nombre):
+    # Conteo de referencias: ¿algún registro apunta todavía a este archivo?
+    return (
+        Propiedad.objects.filter(foto_principal=nombre).exists()
+        or FotoPropiedad.objects.filter(imagen=nombre).exists()
+    )
+
+
+def limpiar_foto_huerfana(nombre):
+    """
+    Borra la foto si ya nadie la usa. Si una subida la reutilizó hace poco
+    (su registro puede no estar confirmado aún), se vuelve a intentar más tarde.
+    """
+    resultado = almacenamiento_fotos.borrar_si_huerfano(nombre, lambda: foto_en_uso(nombre))
+    if resultado == 'reciente':
+        encolar_despues(getattr(settings, 'FOTOS_GRACIA_SEGUNDOS', 600), limpiar_foto_huerfana, nombre)
+
+
+def actualizar_propiedad(propiedad_id, tipos, afectadas=()):
+    """
+    Tarea de la cola al guardar o borrar una Propiedad: primero sus similares
+    y después sus páginas estáticas, en ese orden, para que los paneles de
+    "similares" se generen con las listas ya actualizadas.
+    'afectadas' son las listas que la contenían si se borró (ver signals.py).
+    """
+    # Se importan aquí: NumPy y el render de páginas solo hacen falta en el worker
+    from .similares import actualizar_propiedad as actualizar_similares
+    from .paginas_estaticas import regenerar_por_cambio
+
+    dependientes = actualizar_similares(propiedad_id, afectadas=afectadas)
+    if getattr(settings, 'PAGINAS_ESTATICAS_ROOT', None): # None = desactivado
+        regenerar_por_cambio(propiedad_id, tipos, sorted(dependientes))
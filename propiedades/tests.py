@@ -1,3 +1,359 @@
-from django.test import TestCase
+import datetime
+import random
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import similares
+from .analitica import cuantiles_por_grupo
+from .aumentos import aplicar_aumentos
+from .cache_portal import clave_portal
+from .models import Cliente, Contrato, Pago, PagoArchivado, Propiedad, PropiedadSimilar, RecordatorioEnviado, Tarea
+from .tareas import encolar, ejecutar_tarea, generar_pagos_contrato, reclamar_tareas
+
+
+def crear_propiedad(**campos):
+    datos = {
+        'titulo': 'Depto',
+        'tipo_operacion': 'Renta',
+        'precio': 10000,
+        'direccion': 'Calle 1',
+        'ciudad': 'Guadalajara',
+        'num_habitaciones': 2,
+        'num_baños': 1,
+        'metros_cuadrados': 80,
+    }
+    datos.update(campos)
+    return Propiedad.objects.create(**datos)
+
+
+def correr_cola():
+    # Ejecuta todo lo pendiente en la cola, como 'procesar_tareas --una-vez' con un solo hilo
+    while True:
+        tareas = reclamar_tareas(limite=50)
+        if not tareas:
+            return
+        for tarea_id in tareas:
+            assert ejecutar_tarea(tarea_id) == 'Completada'
+
+
+# Escala fija (sin estandarizar): así la comparación no depende de la media
+# y desviación del momento, que cambian con cada propiedad.
+def escala_fija(numericas):
+    return numericas
+
+
+@override_settings(PAGINAS_ESTATICAS_ROOT=None, SIMILARES_POR_PROPIEDAD=4)
+class SimilaresIncrementalesTests(TestCase):
+    """Con la escala fija, la actualización incremental debe dar lo mismo que 'calcular_todas'."""
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(similares, 'estandarizar', escala_fija))
+        azar = random.Random(1)
+        self.propiedades = [
+            crear_propiedad(
+                titulo=f"Depto {i}",
+                precio=azar.randint(5000, 20000),
+                ciudad=azar.choice(['Guadalajara', 'Zapopan']),
+                num_habitaciones=azar.randint(1, 4),
+                num_baños=azar.randint(1, 3),
+                metros_cuadrados=azar.randint(40, 200),
+            )
+            for i in range(40)
+        ]
+        similares.calcular_todas()
+        correr_cola() # Las tareas que encolaron los create()
+
+    def listas(self):
+        return {
+            propiedad_id: sorted(PropiedadSimilar.objects.filter(propiedad_id=propiedad_id).values_list('similar_id', flat=True))
+            for propiedad_id in Propiedad.objects.filter(estado='Disponible').values_list('pk', flat=True)
+        }
+
+    def assertIgualACalculoCompleto(self):
+        incremental = self.listas()
+        similares.calcular_todas()
+        self.assertEqual(incremental, self.listas())
+
+    def test_precio_atipico_y_de_regreso(self):
+        propiedad = self.propiedades[0]
+        propiedad.precio = 10 ** 7
+        propiedad.save()
+        correr_cola()
+        self.assertIgualACalculoCompleto()
+
+        propiedad.precio = 12000
+        propiedad.save()
+        correr_cola()
+        self.assertIgualACalculoCompleto()
+
+    def test_deja_de_estar_disponible(self):
+        propiedad = self.propiedades[1]
+        propiedad.estado = 'Rentada'
+        propiedad.save()
+        correr_cola()
+        self.assertIgualACalculoCompleto()
+        self.assertFalse(PropiedadSimilar.objects.filter(similar=propiedad).exists())
+
+    def test_cambia_de_tipo_de_operacion(self):
+        propiedad = self.propiedades[2]
+        propiedad.tipo_operacion = 'Venta'
+        propiedad.save()
+        correr_cola()
+        self.assertIgualACalculoCompleto()
+
+    def test_propiedad_nueva_y_borrada(self):
+        crear_propiedad(precio=9000, metros_cuadrados=75)
+        correr_cola()
+        self.assertIgualACalculoCompleto()
+
+        self.propiedades[3].delete()
+        correr_cola()
+        self.assertIgualACalculoCompleto()
+
+    def test_pocas_propiedades_del_tipo(self):
+        # Con menos de k+1 propiedades, cada lista tiene a todas las demás
+        for i in range(3):
+            crear_propiedad(tipo_operacion='Venta', precio=1000000 + i)
+            correr_cola()
+        self.assertIgualACalculoCompleto()
+        self.assertEqual(PropiedadSimilar.objects.filter(propiedad__tipo_operacion='Venta').count(), 6)
+
+
+def crear_contrato(**campos):
+    datos = {
+        'propiedad': crear_propiedad(),
+        'inquilino': Cliente.objects.create(nombre_completo='Ana', email=f"ana{Cliente.objects.count()}@ejemplo.com"),
+        'fecha_inicio': datetime.date(2025, 1, 31),
+        'fecha_fin': datetime.date(2027, 1, 30),
+        'monto_renta_actual': Decimal('1000.00'),
+        'dia_pago_mensual': 31,
+        'frecuencia_aumento_meses': 1,
+        'porcentaje_aumento': Decimal('10.00'),
+    }
+    datos.update(campos)
+    return Contrato.objects.create(**datos)
+
+
+class AplicarAumentosTests(TestCase):
+
+    def test_inicio_31_de_enero_con_varios_periodos_atrasados(self):
+        contrato = crear_contrato()
+        self.assertEqual(contrato.fecha_proximo_aumento, datetime.date(2025, 2, 28))
+
+        # Tocaban el 28 de feb, 31 de mar, 30 de abr y 31 de may
+        cambiados = aplicar_aumentos(datetime.date(2025, 6, 15))
+
+        contrato.refresh_from_db()
+        self.assertEqual(cambiados, {contrato.pk: (Decimal('1000.00'), 4)})
+        self.assertEqual(contrato.fecha_proximo_aumento, datetime.date(2025, 6, 30)) # El día no se "recorre" al 28
+        self.assertEqual(contrato.monto_renta_actual, Decimal('1464.10'))
+
+        # Volver a correrlo el mismo día no aplica nada
+        self.assertEqual(aplicar_aumentos(datetime.date(2025, 6, 15)), {})
+
+    def test_medio_centavo_se_redondea_hacia_arriba(self):
+        contrato = crear_contrato(monto_renta_actual=Decimal('1000.05'))
+        aplicar_aumentos(datetime.date(2025, 3, 1))
+        contrato.refresh_from_db()
+        self.assertEqual(contrato.monto_renta_actual, Decimal('1100.06')) # 1100.055
+        # Comparado en la base: lo guardado ya viene redondeado (no solo al leerlo)
+        self.assertTrue(Contrato.objects.filter(pk=contrato.pk, monto_renta_actual=Decimal('1100.06')).exists())
+
+        # El siguiente aumento parte del monto ya redondeado (1100.06 * 1.1 = 1210.066),
+        # no de 1100.055 guardado sin redondear (que daría 1210.06)
+        aplicar_aumentos(datetime.date(2025, 4, 1))
+        contrato.refresh_from_db()
+        self.assertEqual(contrato.monto_renta_actual, Decimal('1210.07'))
+
+    def test_coincide_con_los_pagos_generados(self):
+        contrato = crear_contrato(
+            monto_renta_actual=Decimal('1234.55'), porcentaje_aumento=Decimal('7.50'), frecuencia_aumento_meses=3
+        )
+        generar_pagos_contrato(contrato.pk)
+        montos = list(contrato.pagos.order_by('fecha_vencimiento').values_list('monto', flat=True))
+
+        # Cada aumento debe dejar la renta igual al pago del mes en que entra
+        for periodo in range(1, 7):
+            aplicar_aumentos(contrato.fecha_inicio + datetime.timedelta(days=92 * periodo))
+            contrato.refresh_from_db()
+            self.assertEqual(contrato.monto_renta_actual, montos[3 * periodo], f"periodo {periodo}")
+
+    def test_no_aplica_despues_del_fin_del_contrato(self):
+        contrato = crear_contrato(fecha_fin=datetime.date(2025, 3, 15))
+        cambiados = aplicar_aumentos(datetime.date(2025, 12, 1))
+        self.assertEqual(cambiados[contrato.pk][1], 1) # Solo el del 28 de febrero
+
+
+def tarea_que_falla():
+    raise ValueError("falla a propósito")
+
+
+def tarea_que_funciona():
+    pass
+
+
+@override_settings(TAREAS_REINTENTO_SEGUNDOS=30, TAREAS_TIEMPO_LIMITE_MINUTOS=30)
+class ColaDeTareasTests(TestCase):
+
+    def test_tarea_exitosa(self):
+        tarea = encolar(tarea_que_funciona)
+        self.assertEqual(reclamar_tareas(limite=10), [tarea.pk])
+        self.assertEqual(ejecutar_tarea(tarea.pk), 'Completada')
+        self.assertEqual(reclamar_tareas(limite=10), [])
+
+    def test_reintentos_con_espera_exponencial(self):
+        tarea = encolar(tarea_que_falla)
+        tarea.max_intentos = 3
+        tarea.save()
+
+        esperas = []
+        for intento in range(1, 4):
+            self.assertEqual(reclamar_tareas(limite=10), [tarea.pk])
+            antes = timezone.now()
+            with self.assertLogs('propiedades.tareas', 'ERROR'):
+                estado = ejecutar_tarea(tarea.pk)
+            tarea.refresh_from_db()
+            self.assertEqual(tarea.intentos, intento)
+            self.assertIn('ValueError', tarea.ultimo_error)
+
+            if estado == 'Pendiente':
+                esperas.append(round((tarea.ejecutar_despues - antes).total_seconds()))
+                # Todavía no le toca: nadie la reclama
+                self.assertEqual(reclamar_tareas(limite=10), [])
+                Tarea.objects.filter(pk=tarea.pk).update(ejecutar_despues=timezone.now())
+
+        self.assertEqual(esperas, [30, 60])
+        self.assertEqual(tarea.estado, 'Fallida')
+        self.assertIsNotNone(tarea.terminada_en)
+
+    def test_reclama_tareas_atoradas_en_proceso(self):
+        atorada = encolar(tarea_que_funciona)
+        en_curso = encolar(tarea_que_funciona)
+        Tarea.objects.filter(pk=atorada.pk).update(
+            estado='En proceso', intentos=1, iniciada_en=timezone.now() - datetime.timedelta(minutes=31)
+        )
+        Tarea.objects.filter(pk=en_curso.pk).update(
+            estado='En proceso', intentos=1, iniciada_en=timezone.now() - datetime.timedelta(minutes=5)
+        )
+
+        self.assertEqual(reclamar_tareas(limite=10), [atorada.pk])
+        atorada.refresh_from_db()
+        self.assertEqual(atorada.intentos, 2)
+        self.assertEqual(reclamar_tareas(limite=10), []) # Ya no está atorada
+
+    def test_dos_workers_no_toman_la_misma_tarea(self):
+        tarea = encolar(tarea_que_funciona)
+        # Lo que los dos workers leyeron como candidata antes de reclamarla
+        pk, estado, iniciada_en = Tarea.objects.filter(pk=tarea.pk).values_list('pk', 'estado', 'iniciada_en').get()
+
+        self.assertEqual(reclamar_tareas(limite=10), [tarea.pk])
+        # El UPDATE condicionado del segundo worker ya no encuentra la fila en ese estado
+        self.assertEqual(
+            Tarea.objects.filter(pk=pk, estado=estado, iniciada_en=iniciada_en).update(estado='En proceso'), 0
+        )
+        self.assertEqual(reclamar_tareas(limite=10), [])
+
+
+class CuantilesPorGrupoTests(TestCase):
+
+    def test_igual_que_np_percentile(self):
+        azar = np.random.default_rng(3)
+        grupos = [azar.uniform(10, 500, size=n) for n in (1, 2, 3, 10, 57)]
+        valores = np.concatenate([np.sort(grupo) for grupo in grupos])
+        conteos = np.array([len(grupo) for grupo in grupos])
+        inicios = np.concatenate(([0], np.cumsum(conteos)[:-1]))
+
+        for q in (0, 0.25, 0.5, 0.75, 1):
+            np.testing.assert_allclose(
+                cuantiles_por_grupo(valores, inicios, conteos, q),
+                [np.percentile(grupo, q * 100) for grupo in grupos],
+            )
+
+
+@override_settings(RECORDATORIOS_PAGO_DIAS=[7, 3, 0, -1], RECORDATORIOS_VENTANA_DIAS=30)
+class RevisarPagosTests(TestCase):
+
+    def setUp(self):
+        hoy = timezone.now().date()
+        self.contrato = crear_contrato(
+            fecha_inicio=hoy - datetime.timedelta(days=400), fecha_fin=hoy + datetime.timedelta(days=400)
+        )
+        # Muchos vencidos viejos (fuera de la ventana) y uno que vence en 3 días
+        for dias in range(40, 400, 30):
+            Pago.objects.create(contrato=self.contrato, monto=Decimal('1000.00'), fecha_vencimiento=hoy - datetime.timedelta(days=dias))
+        Pago.objects.create(contrato=self.contrato, monto=Decimal('1000.00'), fecha_vencimiento=hoy + datetime.timedelta(days=3))
+        Pago.objects.create(contrato=self.contrato, monto=Decimal('1000.00'), fecha_vencimiento=hoy + datetime.timedelta(days=40))
+
+    def revisar(self):
+        call_command('revisar_pagos', stdout=StringIO())
+
+    def test_un_solo_email_aunque_corra_dos_veces(self):
+        self.revisar()
+        self.revisar()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(RecordatorioEnviado.objects.count(), 1)
+        self.assertEqual(Pago.objects.filter(estado='Vencido').count(), 12)
+
+    def test_el_email_incluye_todo_lo_que_debe(self):
+        self.revisar()
+        # 12 vencidos + el que vence en 3 días (el de 40 días todavía no)
+        self.assertIn("13 pago(s)", mail.outbox[0].subject)
+        self.assertIn("13,000.00", mail.outbox[0].alternatives[0][0])
+
+    def test_si_falla_el_envio_se_reintenta_en_la_siguiente(self):
+        with mock.patch('propiedades.management.commands.revisar_pagos.send_mail', side_effect=OSError("SMTP caído")):
+            with self.assertLogs('propiedades.management.commands.revisar_pagos', 'ERROR'):
+                self.revisar()
+        self.assertEqual(RecordatorioEnviado.objects.count(), 0)
+
+        self.revisar()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(RecordatorioEnviado.objects.count(), 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ArchivarPagosTests(TestCase):
+
+    def crear_pagados(self, contrato, cuantos):
+        Pago.objects.bulk_create([
+            Pago(contrato=contrato, monto=Decimal('1000.00'), fecha_vencimiento=contrato.fecha_inicio + datetime.timedelta(days=30 * i), estado='Pagado')
+            for i in range(cuantos)
+        ])
+
+    def archivar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archivar_pagos', meses=1, stdout=StringIO())
+
+    def test_consultas_no_crecen_con_los_pagos(self):
+        contrato = crear_contrato(fecha_inicio=datetime.date(2020, 1, 1), fecha_fin=datetime.date(2021, 1, 1))
+        self.crear_pagados(contrato, 5)
+        with CaptureQueriesContext(connection) as pocos:
+            self.archivar()
+
+        self.crear_pagados(contrato, 40)
+        with CaptureQueriesContext(connection) as muchos:
+            self.archivar()
+
+        self.assertEqual(PagoArchivado.objects.count(), 45)
+        self.assertEqual(len(pocos), len(muchos))
+
+    def test_invalida_el_portal_del_inquilino(self):
+        usuario = User.objects.create_user('ana')
+        contrato = crear_contrato(fecha_inicio=datetime.date(2020, 1, 1), fecha_fin=datetime.date(2021, 1, 1))
+        Cliente.objects.filter(pk=contrato.inquilino_id).update(user=usuario)
+        self.crear_pagados(contrato, 3)
+        cache.set(clave_portal(usuario.pk), {'viejo': True})
+
+        self.archivar()
+        self.assertIsNone(cache.get(clave_portal(usuario.pk)))
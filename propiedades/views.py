@@ -1,9 +1,13 @@
 # propiedades/views.py
 
 from django.shortcuts import render, get_object_or_404
-from .models import Propiedad, Cliente, Contrato, Pago  # Importamos nuestro modelo Propiedad
-from django.contrib.auth.decorators import login_required
+from .models import Propiedad, PropiedadSimilar, EstadisticaPrecio, Cliente, Contrato, Pago, normalizar_ciudad  # Importamos nuestro modelo Propiedad
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
 from django.utils import timezone
+from .cache_portal import clave_portal
+from django.contrib.auth.decorators import login_required
 
 # Esta es la función que conectamos en urls.py
 def pagina_inicio(request):
@@ -38,12 +42,28 @@ def detalle_propiedad(request, pk):
     #    automáticamente muestra una página de Error 404 (No Encontrado).
     prop = get_object_or_404(Propiedad, pk=pk)
     
-    # 2. Preparamos el contexto (solo esta propiedad)
+    # 2. Las propiedades similares ya vienen calculadas (una sola consulta por índice)
+    similares = PropiedadSimilar.objects.filter(
+        propiedad=prop,
+        similar__estado='Disponible'
+    ).select_related('similar')[:settings.SIMILARES_POR_PROPIEDAD]
+
+    # 3. Comparación con la mediana de precio por m² de su ciudad (ya calculada)
+    estadistica = EstadisticaPrecio.objects.filter(
+        ciudad=normalizar_ciudad(prop.ciudad),
+        tipo_operacion=prop.tipo_operacion
+    ).first()
+    vs_mediana = estadistica.diferencia_porcentual(prop.precio_por_m2) if estadistica else None
+
+    # 4. Preparamos el contexto
     contexto = {
-        'propiedad': prop
+        'propiedad': prop,
+        'similares': similares,
+        'estadistica': estadistica,
+        'vs_mediana': vs_mediana,
     }
     
-    # 3. Renderizamos la *nueva* plantilla 'detalle.html'
+    # 5. Renderizamos la *nueva* plantilla 'detalle.html'
     return render(request, 'propiedades/detalle.html', contexto)
 
 # ¡NUEVA VISTA!
@@ -52,52 +72,91 @@ def detalle_propiedad(request, pk):
 @login_required 
 def portal_inquilino(request):
 
+    # Los datos del portal se guardan en caché por usuario y por día (lo que
+    # cuenta como vencido depende de la fecha); las señales los borran cuando
+    # cambia un Pago, Contrato, Cliente o Propiedad suyo.
+    clave = clave_portal(request.user.pk)
+    datos = cache.get(clave)
+
+    if datos is None:
+        datos = datos_portal(request.user)
+        cache.set(clave, datos, settings.PORTAL_CACHE_SEGUNDOS)
+
+    contexto = {
+        'usuario': request.user,
+        **datos,
+    }
+
+    return render(request, 'propiedades/portal.html', contexto)
+
+def datos_portal(user):
+    """
+    Todo lo que muestra el portal de un usuario, ya evaluado
+    (listas, no QuerySets) para poder guardarlo en caché.
+    """
     cliente_perfil = None
     lista_contratos = []
 
     # --- ¡NUEVAS VARIABLES DE NOTIFICACIÓN! ---
     pagos_vencidos = None
+    monto_adeudado = 0
     proximo_pago = None
-    hoy = timezone.now().date() # Obtenemos la fecha de hoy
 
     try:
         # 1. Busca el perfil de cliente
-        cliente_perfil = Cliente.objects.get(user=request.user)
+        cliente_perfil = Cliente.objects.get(user=user)
 
-        # 2. Busca los contratos de ESE cliente
-        lista_contratos = Contrato.objects.filter(
+        # 2. Busca los contratos de ESE cliente, junto con su resumen ya calculado
+        lista_contratos = list(Contrato.objects.filter(
             inquilino=cliente_perfil
-        ).select_related('propiedad')
-
-        # 3. ¡NUEVA LÓGICA DE BÚSQUEDA DE PAGOS!
-
-        # Buscamos pagos VENCIDOS (estado 'Pendiente' Y fecha pasada)
-        pagos_vencidos = Pago.objects.filter(
-            contrato__inquilino=cliente_perfil, # Pagos de este cliente
-            estado='Pendiente',
-            fecha_vencimiento__lt=hoy # __lt = "less than" (menor que hoy)
-        ).order_by('fecha_vencimiento') # Del más antiguo al más nuevo
-
-        # Buscamos el PRÓXIMO pago (estado 'Pendiente' Y fecha futura)
-        proximo_pago = Pago.objects.filter(
-            contrato__inquilino=cliente_perfil, # Pagos de este cliente
-            estado='Pendiente',
-            fecha_vencimiento__gte=hoy # __gte = "greater than or equal" (mayor o igual que hoy)
-        ).order_by('fecha_vencimiento').first() # .first() toma solo el primero
+        ).select_related('propiedad', 'resumen'))
+
+        for contrato in lista_contratos:
+            contrato.historial = list(contrato.historial_pagos()) # Pagos + pagos archivados
+
+        # 3. Los avisos salen del ResumenContrato (sin recorrer los Pagos)
+        resumenes = [contrato.resumen for contrato in lista_contratos if hasattr(contrato, 'resumen')]
+
+        # Si 'revisar_pagos' no corrió, un pago 'Pendiente' ya pasado sigue siendo
+        # el "próximo" del resumen: también cuenta como vencido
+        hoy = timezone.now().date()
+        atrasados = [
+            resumen for resumen in resumenes
+            if resumen.proximo_vencimiento and resumen.proximo_vencimiento < hoy
+        ]
+
+        # Solo si el resumen dice que hay vencidos, traemos el detalle
+        if atrasados or any(resumen.pagos_vencidos for resumen in resumenes):
+            pagos_vencidos = list(Pago.objects.filter(
+                Q(estado='Vencido') | Q(estado='Pendiente', fecha_vencimiento__lt=hoy),
+                contrato__inquilino=cliente_perfil, # Pagos de este cliente
+            ).select_related('contrato__propiedad').order_by('fecha_vencimiento')) # Del más antiguo al más nuevo
+            monto_adeudado = sum(pago.monto for pago in pagos_vencidos)
+
+        # En esos contratos el próximo pago de verdad es el primer 'Pendiente' desde hoy
+        # (solo se cambia el objeto en memoria, el resumen guardado no se toca)
+        for resumen in atrasados:
+            siguiente = Pago.objects.filter(
+                contrato_id=resumen.contrato_id, estado='Pendiente', fecha_vencimiento__gte=hoy
+            ).order_by('fecha_vencimiento').values_list('fecha_vencimiento', 'monto').first()
+            resumen.proximo_vencimiento, resumen.proximo_monto = siguiente or (None, None)
+
+        # El PRÓXIMO pago es el más cercano entre todos sus contratos
+        con_proximo = [resumen for resumen in resumenes if resumen.proximo_vencimiento]
+        if con_proximo:
+            proximo_pago = min(con_proximo, key=lambda resumen: resumen.proximo_vencimiento)
 
     except Cliente.DoesNotExist:
         pass # Si no hay cliente, las variables se quedan en None
 
-    contexto = {
-        'usuario': request.user,
+    return {
         'cliente': cliente_perfil,
         'contratos': lista_contratos,
-        'pagos_vencidos': pagos_vencidos,   # <-- ¡NUEVO!
-        'proximo_pago': proximo_pago         # <-- ¡NUEVO!
+        'pagos_vencidos': pagos_vencidos,
+        'monto_adeudado': monto_adeudado,
+        'proximo_pago': proximo_pago,       # <-- ResumenContrato del pago más cercano
     }
 
-    return render(request, 'propiedades/portal.html', contexto)
-
 def pagina_renta(request):
     
     # 1. Buscamos TODAS las propiedades que sean 'Renta' y 'Disponible'